@@ -5,6 +5,10 @@
 from kivy.uix.effectwidget import EffectWidget, EffectBase
 from kivy.properties import NumericProperty
 
+from logs import get_logger
+
+log = get_logger('app')
+
 
 effect_alpha = '''
 #ifdef GL_ES
@@ -47,5 +51,5 @@ class AlphaEffect(EffectBase):
         self.do_glsl()
 
     def do_glsl(self):
-        print('Doing GLSL with {}'.format(self.effect_width, self.effect_axis))
+        log.debug("AlphaEffect: Doing GLSL with %s along %s", self.effect_width, self.effect_axis)
         self.glsl = effect_alpha.format(self.effect_width/1.0, self.effect_axis)
\ No newline at end of file
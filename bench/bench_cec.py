@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Presses keys on the fake CEC bus (see fake_cec.py) while the options screen is shown,
+# with bus noise, and reports the latency from every key press accepted by CecInput to
+# the options screen's callback, for single presses and for held keys. Accepted presses
+# carry the time they came in from the fake adapter, which sends them on the same thread,
+# and the repeats of held keys the time CecInput generated them.
+#
+# Run from the repository root:  python -m bench.bench_cec
+# On a machine without display, wrap it in xvfb-run.
+
+from bench.common import setup, report
+setup(['--use-sample-data', '--fake-cec', '--fake-cec-noise=50', '--cec-no-wake', '--disable-cache'])
+
+from feduquiz import Feduquiz
+from constants import CEC_CMD_MAP
+from profiler import percentile
+from bench.scripted import ScriptedInput
+
+from collections import defaultdict
+from functools import partial
+from time import perf_counter
+
+import fake_cec
+
+# Number of options in the Options screen's ScrollMenu
+MENU_ITEMS = 9
+
+SINGLE_PRESSES = ([{'key': 'DOWN', 'wait': 0.3}] * (MENU_ITEMS - 1) + [{'key': 'UP', 'wait': 0.3}] * (MENU_ITEMS - 1))
+HELD_KEYS = [{'key': 'DOWN', 'hold': 2, 'wait': 1}, {'key': 'UP', 'hold': 2, 'wait': 1}]
+
+
+class CecBenchmark:
+
+    def __init__(self):
+        self.app = Feduquiz()
+        self.phase = None
+        self.latencies = defaultdict(list)
+        self.sent = {}
+        # Timestamp of the key CecInput is passing on
+        self.timestamp = None
+        self.dispatch = self.app.cec_input.callback
+        self.app.cec_input.callback = self.accepted
+        for name in ('UP', 'DOWN'):
+            # Called before the menu's own callbacks
+            self.app.add_callback(CEC_CMD_MAP[name], 'options', partial(self.received, name), priority=100)
+
+    def accepted(self, name, timestamp):
+        """Sits between CecInput and the app, to catch the timestamp of every key passed on."""
+        self.timestamp = timestamp
+        self.dispatch(name, timestamp)
+
+    def received(self, name):
+        now = perf_counter()
+        if self.phase is None or self.timestamp is None:
+            return
+        self.latencies[self.phase].append(now - self.timestamp)
+        self.timestamp = None
+
+    def play(self, phase, steps):
+        adapter = fake_cec.adapter
+        self.phase = phase
+        first_sent = len(adapter.sent)
+        adapter.play(steps)
+        yield lambda: not adapter.steps
+        yield 1
+        self.sent[phase] = len(adapter.sent) - first_sent
+        self.phase = None
+
+    def script(self):
+        from cec_control import CONNECTED
+        app = self.app
+        yield lambda: app.cec.state == CONNECTED
+        yield 3
+        app.goto_screen(s_name='options')
+        yield 2
+        for item in self.play('single presses', SINGLE_PRESSES):
+            yield item
+        for item in self.play('held keys', HELD_KEYS):
+            yield item
+
+    def run(self):
+        ScriptedInput(self.script(), self.app.stop)
+        self.app.run()
+        rows = []
+        for phase in ('single presses', 'held keys'):
+            latencies = sorted(self.latencies[phase])
+            if not latencies:
+                continue
+            rows.append(("{}, frames sent / keys handled".format(phase), "{} / {}".format(self.sent.get(phase), len(latencies))))
+            rows.append(("{}, latency".format(phase), "p50 {:.1f} ms, p95 {:.1f} ms, max {:.1f} ms".format(
+                percentile(latencies, 0.5) * 1000, percentile(latencies, 0.95) * 1000, latencies[-1] * 1000)))
+        report("CEC input benchmark", rows)
+
+
+if __name__ == '__main__':
+    CecBenchmark().run()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Plays a full game against the sample data and scrolls through the options menu with a
+# scripted input source, then reports frame drops, wall time per question and the time
+# from load_game to the first rendered question.
+#
+# Run from the repository root:  python -m bench.bench_game
+# On a machine without display, wrap it in xvfb-run.
+
+from bench.common import setup, report
+setup(['--use-sample-data', '--disable-cec', '--disable-cache'])
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+
+from feduquiz import Feduquiz
+from profiler import percentile
+from bench.scripted import ScriptedInput
+
+from collections import defaultdict
+from time import perf_counter
+
+# A frame is considered dropped if it took longer than 1.5 frames at 60 fps
+FRAME_BUDGET = 1 / 60.
+DROP_THRESHOLD = 1.5 * FRAME_BUDGET
+
+# Number of options in the Options screen's ScrollMenu
+MENU_ITEMS = 9
+
+
+class GameBenchmark:
+
+    def __init__(self):
+        self.app = Feduquiz()
+        self.phase = 'startup'
+        self.frames = defaultdict(list)
+        self.question_times = []
+        self.load_to_question = None
+        self.flip_time = None
+        Clock.schedule_interval(self.record_frame, 0)
+        Window.bind(on_flip=self.on_flip)
+        Clock.schedule_once(lambda dt: ScriptedInput(self.script(), self.app.stop), 1)
+
+    def record_frame(self, dt):
+        self.frames[self.phase].append(dt)
+
+    def on_flip(self, *args):
+        if self.flip_time is None:
+            self.flip_time = perf_counter()
+
+    def script(self):
+        app = self.app
+
+        # Let the intro animation settle
+        yield 3
+
+        # Start a game and wait for the first frame showing its first question
+        self.phase = 'load_game'
+        start = perf_counter()
+        app.load_game()
+        yield lambda: app.sm.current == 'game'
+        self.flip_time = None
+        yield lambda: self.flip_time is not None
+        self.load_to_question = self.flip_time - start
+
+        # Answer every question with the red button
+        self.phase = 'game'
+        game = app.sm.get_screen('game')
+        while True:
+            yield lambda: game.buttons_active or app.sm.current == 'score'
+            if app.sm.current == 'score':
+                break
+            pressed = perf_counter()
+            game.button_press('red')
+            yield lambda: game.buttons_active or app.sm.current == 'score'
+            self.question_times.append(perf_counter() - pressed)
+
+        # Scroll through the options menu and back
+        self.phase = 'score'
+        yield 2
+        app.goto_screen(s_name='options')
+        yield 2
+        self.phase = 'menu'
+        for cmd in ['DOWN'] * (MENU_ITEMS - 1) + ['UP'] * (MENU_ITEMS - 1):
+            app.command_callback(cmd, 'bench')
+            yield 0.2
+        self.phase = 'end'
+
+    def run(self):
+        self.app.run()
+        rows = []
+        for phase in ('startup', 'load_game', 'game', 'score', 'menu'):
+            frames = sorted(self.frames[phase])
+            dropped = sum(1 for dt in frames if dt > DROP_THRESHOLD)
+            rows.append(("{} frames".format(phase), "{} ({} dropped, p95 {:.1f} ms, max {:.1f} ms)".format(
+                len(frames), dropped, percentile(frames, 0.95) * 1000, (frames[-1] if frames else 0) * 1000)))
+        if self.load_to_question is not None:
+            rows.append(("load_game to first question", "{:.1f} ms".format(self.load_to_question * 1000)))
+        if self.question_times:
+            rows.append(("questions answered", str(len(self.question_times))))
+            rows.append(("wall time per question", "mean {:.1f} ms, max {:.1f} ms".format(
+                sum(self.question_times) / len(self.question_times) * 1000, max(self.question_times) * 1000)))
+        report("Game loop benchmark", rows)
+
+
+if __name__ == '__main__':
+    GameBenchmark().run()
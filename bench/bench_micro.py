@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Micro-benchmarks for Trivia.html_decode, get_categories, command dispatching and the
+# filtering of CEC traffic.
+#
+# Run from the repository root:  python -m bench.bench_micro
+
+from bench.common import setup, report
+setup(['--use-sample-data', '--disable-cec', '--disable-cache'])
+
+from constants import CEC_CMD_MAP
+from command_dispatch import CommandDispatcher, ALL_SCREENS
+from cec_input import CecInput
+from helpers import get_categories
+from idle import IdleManager
+from trivia import Trivia
+
+from html import unescape
+from time import perf_counter
+from types import SimpleNamespace
+from timeit import Timer
+
+import json
+
+SCREENS = ['intro', 'game', 'score', 'options', 'instructions', 'credits']
+
+
+def timed(func, number):
+    """Returns the best time per call in microseconds over a few repetitions."""
+    return min(Timer(func).repeat(repeat=5, number=number)) / number * 1e6
+
+
+def timed_fresh(func, data, number):
+    """Like timed, but passes a fresh copy of data to every call, for functions working in place."""
+    # A JSON round trip also un-shares repeated questions, unlike deepcopy
+    raw = json.dumps(data)
+    best = None
+    for _ in range(5):
+        copies = [json.loads(raw) for _ in range(number)]
+        start = perf_counter()
+        for copy in copies:
+            func(copy)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number * 1e6
+
+
+def html_decode_recursive(quiz_obj):
+    """The former Trivia.html_decode, unescaping every leaf of the response into new containers."""
+    if isinstance(quiz_obj, dict):
+        return {k: html_decode_recursive(v) for k, v in quiz_obj.items()}
+    elif isinstance(quiz_obj, list):
+        return [html_decode_recursive(elem) for elem in quiz_obj]
+    else:
+        return unescape(quiz_obj)
+
+
+def bench_html_decode():
+    with open('resources/sample_quiz_data.json') as f:
+        results = json.load(f)['results']
+    trivia = Trivia(use_sample_data=True)
+    rows = []
+    for amount in (10, 500):
+        batch = (results * (amount // len(results) + 1))[:amount]
+        rows.append(("html_decode, {} questions".format(amount),
+                     "{:.1f} us".format(timed_fresh(trivia.html_decode, batch, 20))))
+        rows.append(("recursive html_decode, {} questions".format(amount),
+                     "{:.1f} us".format(timed_fresh(html_decode_recursive, batch, 20))))
+    return rows
+
+
+def bench_get_categories():
+    return [("get_categories", "{:.1f} us".format(timed(get_categories, 1000)))]
+
+
+def make_dispatcher(extra_screens):
+    """Registers handlers like the app does, plus handlers for a number of additional screens."""
+    dispatcher = CommandDispatcher()
+    dispatcher.add(CEC_CMD_MAP["EXIT"], ALL_SCREENS, lambda: None)
+    for screen in SCREENS + ["extra_{}".format(i) for i in range(extra_screens)]:
+        for cmd in CEC_CMD_MAP.values():
+            dispatcher.add(cmd, screen, lambda: None)
+    return dispatcher
+
+
+def bench_command_callback():
+    from feduquiz import Feduquiz
+    command_callback = Feduquiz.command_callback
+    rows = []
+    for extra_screens in (0, 100):
+        app = SimpleNamespace(dispatcher=make_dispatcher(extra_screens), sm=SimpleNamespace(current='options'),
+                              idle_manager=IdleManager(timeout=0), latency=None)
+        for origin, cmd in (('cec', "DOWN"), ('keyboard', CEC_CMD_MAP["DOWN"][0]), ('keyboard', 1234)):
+            rows.append(("command_callback, {} screens, {} {}".format(len(SCREENS) + extra_screens, origin, cmd),
+                         "{:.2f} us".format(timed(lambda: command_callback(app, cmd, origin), 10000))))
+    return rows
+
+
+def bench_cec_receive():
+    rows = []
+    for label, key, duration in (('held arrow key', 0x02, 0), ('held OK key', 0x00, 0), ('key release', 0x02, 300),
+                                 ('unknown key', 0x20, 0)):
+        # Nothing drains the queue here, keep it from filling up
+        cec_input = CecInput(lambda cmd: None, repeat_delay=0, min_repeat_interval=0)
+        cec_input.drain_trigger = cec_input.pending.clear
+        rows.append(("CecInput.receive_key, {}".format(label),
+                     "{:.2f} us".format(timed(lambda: cec_input.receive_key(key, duration), 10000))))
+    return rows
+
+
+if __name__ == '__main__':
+    report("Micro-benchmarks",
+           bench_html_decode() + bench_get_categories() + bench_command_callback() + bench_cec_receive())
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Shared setup for the benchmarks. This module has to be imported before anything
+# that imports Kivy, as it configures Kivy for headless runs.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup(app_args=()):
+    """
+    Prepares the process for running (parts of) the app without a visible window:
+    Kivy ignores the command line, the window is hidden, resources are found relative
+    to the repository root and the app's own CLI flags are set to app_args.
+    Set BENCH_MOCK_GL=1 to use Kivy's mock GL backend on machines without a GPU (frame
+    timings are then meaningless, but the pipeline can still be exercised).
+    """
+    os.environ['KIVY_NO_ARGS'] = '1'
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    if os.environ.get('BENCH_MOCK_GL'):
+        os.environ['KIVY_GL_BACKEND'] = 'mock'
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    sys.argv = [sys.argv[0]] + list(app_args)
+
+    from kivy.config import Config
+    Config.set('graphics', 'window_state', 'hidden')
+    Config.set('graphics', 'width', '1920')
+    Config.set('graphics', 'height', '1080')
+
+
+def report(title, rows):
+    """Prints a simple two column report."""
+    print(title)
+    print('=' * len(title))
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print("{}  {}".format(name.ljust(width), value))
+    print()
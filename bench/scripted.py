@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Scripted driving of the app for the benchmarks. Import it after bench.common.setup.
+
+from kivy.clock import Clock
+
+from time import perf_counter
+
+
+class ScriptedInput:
+    """
+    Runs a script driving the app, one step per frame. The script is a generator yielding
+    either a number of seconds to wait for, or a predicate to wait for until it is true.
+    """
+
+    def __init__(self, script, on_done):
+        self.script = script
+        self.on_done = on_done
+        self.condition = None
+        self.wake_at = 0
+        self.event = Clock.schedule_interval(self.step, 0)
+
+    def step(self, dt):
+        if self.condition is not None:
+            if not self.condition():
+                return
+        elif perf_counter() < self.wake_at:
+            return
+        try:
+            item = next(self.script)
+        except StopIteration:
+            self.event.cancel()
+            self.on_done()
+            return
+        if callable(item):
+            self.condition = item
+        else:
+            self.condition = None
+            self.wake_at = perf_counter() + item
@@ -35,6 +35,63 @@
 import cec
 # print(cec)
 
+from collections import deque
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from logs import get_logger
+
+log = get_logger('cec')
+
+# States of a CecConnection
+INITIALISING = 'initialising'
+CONNECTED = 'connected'
+NO_ADAPTER = 'no adapter'
+FAILED = 'failed'
+
+# CEC opcodes the device registry follows on the bus
+OPCODE_IMAGE_VIEW_ON = 0x04
+OPCODE_TEXT_VIEW_ON = 0x0d
+OPCODE_STANDBY = 0x36
+OPCODE_SET_OSD_NAME = 0x47
+OPCODE_ACTIVE_SOURCE = 0x82
+OPCODE_REPORT_PHYSICAL_ADDRESS = 0x84
+OPCODE_DEVICE_VENDOR_ID = 0x87
+OPCODE_REPORT_POWER_STATUS = 0x90
+
+class CecDevice:
+  """
+  What is known about the device at one logical address of the bus. updated is the time
+  (monotonic) the device was last queried as a whole, field_updated the time each field
+  was last seen in the bus traffic.
+  """
+
+  __slots__ = ('address', 'name', 'vendor', 'physical_address', 'cec_version', 'power', 'active', 'updated',
+               'field_updated')
+
+  def __init__(self, address):
+    self.address = address
+    self.name = ''
+    self.vendor = None
+    self.physical_address = None
+    self.cec_version = None
+    self.power = cec.CEC_POWER_STATUS_UNKNOWN
+    self.active = False
+    self.updated = 0
+    self.field_updated = {}
+
+  def __repr__(self):
+    return "<CecDevice {} {!r}>".format(self.address, self.name)
+
+  def set(self, field, value):
+    """Sets a field from the bus traffic."""
+    setattr(self, field, value)
+    self.field_updated[field] = monotonic()
+
+  def age(self, field=None):
+    """Seconds since the device was last queried, or since field was last seen in the traffic if later."""
+    return monotonic() - max(self.updated, self.field_updated.get(field, 0))
+
 class pyCecClient:
   cecconfig = cec.libcec_configuration()
   lib = {}
@@ -62,29 +119,38 @@ class pyCecClient:
     retval = None
     adapters = self.lib.DetectAdapters()
     for adapter in adapters:
-      print("found a CEC adapter:")
-      print("port:     " + adapter.strComName)
-      print("vendor:   " + hex(adapter.iVendorId))
-      print("product:  " + hex(adapter.iProductId))
+      log.info("CEC: Found a CEC adapter on port %s, vendor %s, product %s",
+               adapter.strComName, hex(adapter.iVendorId), hex(adapter.iProductId))
       retval = adapter.strComName
     return retval
 
-  # initialise libCEC
+  # initialise libCEC, returns the state of the connection
   def InitLibCec(self):
-    self.lib = cec.ICECAdapter.Create(self.cecconfig)
-    # print libCEC version and compilation information
-    print("libCEC version " + self.lib.VersionToString(self.cecconfig.serverVersion) + " loaded: " + self.lib.GetLibInfo())
+    if not self.lib:
+      self.lib = cec.ICECAdapter.Create(self.cecconfig)
+      # log libCEC version and compilation information
+      log.info("CEC: libCEC version %s loaded: %s", self.lib.VersionToString(self.cecconfig.serverVersion),
+               self.lib.GetLibInfo())
 
     # search for adapters
     adapter = self.DetectAdapter()
     if adapter == None:
-      print("No adapters found")
-    else:
-      if self.lib.Open(adapter):
-        print("connection opened")
-        #self.MainLoop()
-      else:
-        print("failed to open a connection to the CEC adapter")
+      log.debug("CEC: No adapters found")
+      return NO_ADAPTER
+    if self.lib.Open(adapter):
+      log.info("CEC: Connection opened")
+      return CONNECTED
+    log.debug("CEC: Failed to open a connection to the CEC adapter")
+    return FAILED
+
+  # check whether the adapter still answers
+  def PingAdapter(self):
+    return bool(self.lib) and self.lib.PingAdapter()
+
+  # close the connection to the adapter
+  def Close(self):
+    if self.lib:
+      self.lib.Close()
 
   # display the addresses controlled by libCEC
   def ProcessCommandSelf(self):
@@ -107,6 +173,22 @@ class pyCecClient:
   def ProcessCommandActiveSource(self):
     self.lib.SetActiveSource()
 
+  # power on the TV
+  def PowerOnTV(self):
+    self.lib.PowerOnDevices(cec.CECDEVICE_TV)
+
+  # query everything about the device at the given logical address
+  def GetDevice(self, address):
+    device = CecDevice(address)
+    device.vendor = self.lib.GetDeviceVendorId(address)
+    device.physical_address = self.lib.GetDevicePhysicalAddress(address)
+    device.active = self.lib.IsActiveSource(address)
+    device.cec_version = self.lib.GetDeviceCecVersion(address)
+    device.power = self.lib.GetDevicePowerStatus(address)
+    device.name = self.lib.GetDeviceOSDName(address)
+    device.updated = monotonic()
+    return device
+
   # send a standby command
   def ProcessCommandStandby(self):
     self.lib.StandbyDevices(cec.CECDEVICE_BROADCAST)
@@ -129,19 +211,14 @@ class pyCecClient:
     x = 0
     while x < 15:
       if addresses.IsSet(x):
-        vendorId        = self.lib.GetDeviceVendorId(x)
-        physicalAddress = self.lib.GetDevicePhysicalAddress(x)
-        active          = self.lib.IsActiveSource(x)
-        cecVersion      = self.lib.GetDeviceCecVersion(x)
-        power           = self.lib.GetDevicePowerStatus(x)
-        osdName         = self.lib.GetDeviceOSDName(x)
+        device = self.GetDevice(x)
         strLog += "device #" + str(x) +": " + self.lib.LogicalAddressToString(x)  + "\n"
-        strLog += "address:       " + str(physicalAddress) + "\n"
-        strLog += "active source: " + str(active) + "\n"
-        strLog += "vendor:        " + self.lib.VendorIdToString(vendorId) + "\n"
-        strLog += "CEC version:   " + self.lib.CecVersionToString(cecVersion) + "\n"
-        strLog += "OSD name:      " + osdName + "\n"
-        strLog += "power status:  " + self.lib.PowerStatusToString(power) + "\n\n\n"
+        strLog += "address:       " + str(device.physical_address) + "\n"
+        strLog += "active source: " + str(device.active) + "\n"
+        strLog += "vendor:        " + self.lib.VendorIdToString(device.vendor) + "\n"
+        strLog += "CEC version:   " + self.lib.CecVersionToString(device.cec_version) + "\n"
+        strLog += "OSD name:      " + device.name + "\n"
+        strLog += "power status:  " + self.lib.PowerStatusToString(device.power) + "\n\n\n"
       x += 1
     print(strLog)
 
@@ -196,6 +273,203 @@ class pyCecClient:
   def __init__(self):
     self.SetConfiguration()
 
+class CecConnection:
+  """
+  Brings up libCEC on a background thread, so that the app starts (and takes keyboard
+  input) without waiting for the adapter and the HDMI bus. The connection then moves
+  between the states INITIALISING, CONNECTED, NO_ADAPTER and FAILED: the adapter is
+  pinged every ping_interval seconds while connected, and the connection is opened
+  again after retry_delay seconds if there was no adapter, opening it failed or the
+  adapter stopped answering. Only changes of the state are logged, retrying in the same
+  state is logged at debug level.
+  """
+
+  def __init__(self, client, ping_interval=5, retry_delay=10, on_state=None):
+    """
+    :param client: The pyCecClient, with its callbacks already set.
+    :param on_state: Called with every new state, on the connection's thread.
+    """
+    self.client = client
+    self.ping_interval = ping_interval
+    self.retry_delay = retry_delay
+    self.on_state = on_state
+    self.state = INITIALISING
+    self.stopped = Event()
+    self.thread = Thread(target=self.run, name='cec', daemon=True)
+
+  def start(self):
+    self.thread.start()
+
+  def stop(self):
+    self.stopped.set()
+
+  def set_state(self, state):
+    if state != self.state:
+      if state == FAILED:
+        log.error("CEC: Connection %s", state)
+      elif state == NO_ADAPTER:
+        log.warning("CEC: Connection %s", state)
+      else:
+        log.info("CEC: Connection %s", state)
+      self.state = state
+      if self.on_state:
+        self.on_state(state)
+
+  def run(self):
+    while not self.stopped.is_set():
+      if self.state != CONNECTED:
+        if self.state != INITIALISING:
+          log.debug("CEC: Opening the connection again")
+        try:
+          self.set_state(self.client.InitLibCec())
+        except Exception as exc:
+          log.exception("CEC: Could not initialise libCEC: %s", exc)
+          self.set_state(FAILED)
+      elif not self.client.PingAdapter():
+        log.warning("CEC: The adapter does not answer anymore, reconnecting")
+        self.client.Close()
+        self.set_state(FAILED)
+        continue
+      self.stopped.wait(self.ping_interval if self.state == CONNECTED else self.retry_delay)
+    if self.state == CONNECTED:
+      self.client.Close()
+
+class CecDeviceRegistry:
+  """
+  Cache of the devices on the CEC bus. The bus is scanned on a background thread, as
+  libCEC blocks while it asks the devices, and entries are kept up to date from the bus
+  traffic (power status reports, standby, active source, ...), so that looking up a
+  device never blocks. Entries neither queried nor seen in the traffic within ttl seconds
+  are queried again in the background when they are looked up. Commands like powering on the TV are run on the
+  same thread.
+  """
+
+  def __init__(self, client, ttl=300):
+    self.client = client
+    self.ttl = ttl
+    self.devices = {}
+    self.lock = Lock()
+    self.jobs = deque()
+    self.wake = Event()
+    self.stopped = Event()
+    self.thread = Thread(target=self.run, name='cec-devices', daemon=True)
+    self.thread.start()
+
+  def stop(self, timeout=2):
+    """
+    Stops the registry's thread, dropping the jobs not started yet, and waits up to timeout
+    seconds for the running one, as libCEC may block for a while when asking the devices.
+    """
+    self.stopped.set()
+    self.wake.set()
+    self.thread.join(timeout)
+
+  def get(self, address, field=None):
+    """
+    Returns the cached device at the given logical address, or None if it is not known (yet).
+    If a field is given, the device is only queried again if that field is out of date.
+    """
+    device = self.devices.get(address)
+    if device is None or device.age(field) > self.ttl:
+      self.request(self.refresh, address)
+    return device
+
+  def get_tv_power(self):
+    """Returns the cached power status of the TV, one of the cec.CEC_POWER_STATUS_* values."""
+    tv = self.get(cec.CECDEVICE_TV, 'power')
+    return tv.power if tv else cec.CEC_POWER_STATUS_UNKNOWN
+
+  def request(self, func, *args):
+    """Runs func(*args) on the registry's thread."""
+    self.jobs.append((func, args))
+    self.wake.set()
+
+  def scan(self):
+    """Queries every device on the bus, in the background."""
+    self.request(self.scan_now)
+
+  def power_on_tv(self):
+    """Powers on the TV in the background, unless it is known to be on already."""
+    self.request(self.power_on_tv_now)
+
+  def make_active_source(self):
+    """Makes the app the active source in the background, so that the TV shows it."""
+    self.request(self.client.ProcessCommandActiveSource)
+
+  def run(self):
+    while not self.stopped.is_set():
+      self.wake.wait()
+      self.wake.clear()
+      while self.jobs and not self.stopped.is_set():
+        func, args = self.jobs.popleft()
+        try:
+          func(*args)
+        except Exception as exc:
+          log.exception("CEC: %s failed: %s", func.__name__, exc)
+
+  def scan_now(self):
+    addresses = self.client.lib.GetActiveDevices()
+    for address in range(15):
+      if addresses.IsSet(address):
+        self.refresh(address)
+      else:
+        with self.lock:
+          self.devices.pop(address, None)
+    with self.lock:
+      log.info("CEC: Found devices %s", sorted(self.devices.values(), key=lambda device: device.address))
+
+  def refresh(self, address):
+    device = self.client.GetDevice(address)
+    with self.lock:
+      self.devices[address] = device
+
+  def power_on_tv_now(self):
+    if self.get_tv_power() != cec.CEC_POWER_STATUS_ON:
+      log.info("CEC: Powering on the TV")
+      self.client.PowerOnTV()
+
+  def get_or_add(self, address):
+    device = self.devices.get(address)
+    if device is None:
+      device = self.devices[address] = CecDevice(address)
+    return device
+
+  def on_command(self, cmd):
+    """
+    Command callback for libCEC, updating the registry from the traffic on the bus, e.g.
+    ">> 0f:36" or "<< 10:47:46:65:64:75". Called on libCEC's thread.
+    """
+    parts = cmd[3:].split(':')
+    if len(parts) < 2:
+      return 0
+    try:
+      header = int(parts[0], 16)
+      opcode = int(parts[1], 16)
+      params = [int(part, 16) for part in parts[2:]]
+    except ValueError:
+      return 0
+    initiator, destination = header >> 4, header & 0xf
+    with self.lock:
+      if opcode == OPCODE_REPORT_POWER_STATUS and params:
+        self.get_or_add(initiator).set('power', params[0])
+      elif opcode in (OPCODE_IMAGE_VIEW_ON, OPCODE_TEXT_VIEW_ON):
+        self.get_or_add(cec.CECDEVICE_TV).set('power', cec.CEC_POWER_STATUS_ON)
+      elif opcode == OPCODE_STANDBY:
+        devices = self.devices.values() if destination == cec.CECDEVICE_BROADCAST else [self.get_or_add(destination)]
+        for device in devices:
+          device.set('power', cec.CEC_POWER_STATUS_STANDBY)
+      elif opcode == OPCODE_ACTIVE_SOURCE:
+        for device in self.devices.values():
+          device.set('active', False)
+        self.get_or_add(initiator).set('active', True)
+      elif opcode == OPCODE_SET_OSD_NAME:
+        self.get_or_add(initiator).set('name', bytes(params).decode('ascii', 'replace'))
+      elif opcode == OPCODE_REPORT_PHYSICAL_ADDRESS and len(params) >= 2:
+        self.get_or_add(initiator).set('physical_address', (params[0] << 8) | params[1])
+      elif opcode == OPCODE_DEVICE_VENDOR_ID and len(params) >= 3:
+        self.get_or_add(initiator).set('vendor', (params[0] << 16) | (params[1] << 8) | params[2])
+    return 0
+
 # logging callback
 def log_callback(level, time, message):
   return lib.LogCallback(level, time, message)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy.clock import Clock
+
+from collections import deque
+from time import monotonic, perf_counter
+
+from constants import CEC_KEY_MAP, CEC_REPEAT_KEYS
+from logs import get_logger, is_debug
+
+log = get_logger('input')
+INPUT_DEBUG = is_debug(log)
+
+
+class CecInput:
+    """
+    Receives the key presses reported by libCEC on libCEC's own callback thread and hands
+    the app's logical keys (the keys of CEC_CMD_MAP, e.g. "OK") over to the UI thread.
+    Unknown keys and key releases are dropped right away. While a key is held, the remote
+    keeps sending presses, which only tell that the key is still held and are dropped.
+    Arrow keys repeat on their own instead, driven by the Clock: after repeat_delay
+    seconds and then faster and faster, from repeat_interval down to min_repeat_interval,
+    so that long menus and option lists can be scrolled through. Repeating stops once the
+    key is released, or once no press of it has come in for release_timeout seconds.
+    Accepted keys go through a bounded deque, which needs no lock as appending and popping
+    are atomic, and are drained on the next frame, so that the main loop runs at most once
+    per frame on behalf of CEC input.
+    """
+
+    def __init__(self, callback, max_pending=8, repeat_delay=0.4, repeat_interval=0.2, min_repeat_interval=0.05,
+                 acceleration=0.8, release_timeout=0.5):
+        """
+        :param callback: Called with every accepted key and the time (perf_counter) it was received, on the UI thread.
+                         Repeats count as received when they are generated.
+        :param max_pending: Number of keys kept while the UI thread is busy, the oldest are dropped first.
+        :param acceleration: Factor applied to the repeat interval after every repeat.
+        :param release_timeout: Seconds without presses after which a key counts as released, for
+                                remotes whose releases do not make it to libCEC.
+        """
+        self.callback = callback
+        self.pending = deque(maxlen=max_pending)
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.min_repeat_interval = min_repeat_interval
+        self.acceleration = acceleration
+        self.release_timeout = release_timeout
+        # Written on libCEC's thread: the key being held and when it was last reported
+        self.held_key = None
+        self.last_press = 0
+        # UI thread only: the key being repeated
+        self.repeat_key = None
+        self.repeat_event = None
+        self.interval = repeat_interval
+        self.drain_trigger = Clock.create_trigger(self.drain)
+
+    def receive_key(self, key, duration):
+        """
+        Key press callback for libCEC, called on libCEC's thread. duration is 0 while the
+        key is pressed and the time it was held for once it is released.
+        """
+        name = CEC_KEY_MAP.get(key)
+        if name is None:
+            return 0
+        if duration:
+            if name == self.held_key:
+                self.held_key = None
+            return 0
+        now = monotonic()
+        if name == self.held_key and now - self.last_press <= self.release_timeout:
+            # The key is still held, repeating it is up to repeat
+            self.last_press = now
+            if INPUT_DEBUG:
+                log.debug("Input: Dropping repeated CEC key %s", name)
+            return 0
+        self.held_key = name
+        self.last_press = now
+        self.pending.append((name, perf_counter()))
+        self.drain_trigger()
+        return 0
+
+    def drain(self, dt=None):
+        """Passes the pending keys on, on the UI thread, and starts repeating held arrow keys."""
+        pending = self.pending
+        while pending:
+            name, timestamp = pending.popleft()
+            self.callback(name, timestamp)
+            if name in CEC_REPEAT_KEYS:
+                self.start_repeat(name)
+
+    def start_repeat(self, name):
+        self.stop_repeat()
+        self.repeat_key = name
+        self.interval = self.repeat_interval
+        self.repeat_event = Clock.schedule_once(self.repeat, self.repeat_delay)
+
+    def stop_repeat(self):
+        if self.repeat_event is not None:
+            self.repeat_event.cancel()
+            self.repeat_event = None
+        self.repeat_key = None
+
+    def repeat(self, dt=None):
+        """Repeats the held key, for as long as it is held."""
+        name = self.repeat_key
+        if name != self.held_key:
+            self.stop_repeat()
+            return
+        if monotonic() - self.last_press > self.release_timeout:
+            # No release, but no presses either: the release got lost on the way
+            if INPUT_DEBUG:
+                log.debug("Input: No presses of CEC key %s for %s s, counting it as released", name,
+                          self.release_timeout)
+            self.held_key = None
+            self.stop_repeat()
+            return
+        self.callback(name, perf_counter())
+        self.repeat_event = Clock.schedule_once(self.repeat, self.interval)
+        self.interval = max(self.min_repeat_interval, self.interval * self.acceleration)
+
+    def stop(self):
+        """Stops repeating, e.g. when the app stops."""
+        self.stop_repeat()
+        self.drain_trigger.cancel()
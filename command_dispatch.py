@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from itertools import count
+
+from constants import CEC_CMD_MAP
+
+# Screen name for callbacks that apply on every screen
+ALL_SCREENS = "ALL"
+
+
+class CommandDispatcher:
+    """
+    Registry mapping remote control / keyboard commands to callbacks per screen.
+
+    Commands are normalized to their logical key name (the keys of CEC_CMD_MAP, e.g. "OK"),
+    so a CEC key and the matching keyboard key code resolve to the same handlers.
+    Lookup tables are precomputed whenever a callback is added or removed, so dispatching
+    a command costs two dict lookups no matter how many handlers are registered.
+    """
+
+    def __init__(self, cmd_map=CEC_CMD_MAP):
+        self.key_names = {raw: name for name, raws in cmd_map.items() for raw in raws}
+        self.order = count()
+        # (screen, key) -> list of (-priority, registration order, callback)
+        self.entries = {}
+        # Handle -> list of (screen, key) the callback is registered for
+        self.handles = {}
+        # Precomputed lookup tables: (screen, key) -> callbacks, with the ALL layer merged in,
+        # and key -> callbacks of the ALL layer for screens without own handlers.
+        self.table = {}
+        self.all_table = {}
+
+    def normalize(self, cmd):
+        """Returns the logical key name of a raw command, or the command itself if it is unknown."""
+        return self.key_names.get(cmd, cmd)
+
+    def add(self, cmd, screen, callback, priority=0):
+        """
+        Registers callback for cmd on the given screen (or on every screen, using ALL_SCREENS).
+        cmd can be a logical key name, a raw command or a list of these, such as the values
+        of CEC_CMD_MAP. Callbacks with a higher priority are called first, callbacks of the
+        same priority in order of registration.
+        Returns a handle that can be passed to remove().
+        """
+        cmds = cmd if isinstance(cmd, (list, tuple)) else [cmd]
+        handle = next(self.order)
+        slots = []
+        for key in {self.normalize(c) for c in cmds}:
+            self.entries.setdefault((screen, key), []).append((-priority, handle, callback))
+            slots.append((screen, key))
+        self.handles[handle] = slots
+        self.rebuild()
+        return handle
+
+    def remove(self, handle):
+        """Unregisters the callback that was registered under the given handle."""
+        for slot in self.handles.pop(handle, []):
+            entries = [entry for entry in self.entries[slot] if entry[1] != handle]
+            if entries:
+                self.entries[slot] = entries
+            else:
+                del self.entries[slot]
+        self.rebuild()
+
+    def rebuild(self):
+        """Recomputes the lookup tables from the registered entries."""
+        all_layer = {key: entries for (screen, key), entries in self.entries.items() if screen == ALL_SCREENS}
+        self.all_table = {key: tuple(entry[2] for entry in sorted(entries)) for key, entries in all_layer.items()}
+        self.table = {
+            (screen, key): tuple(entry[2] for entry in sorted(entries + all_layer.get(key, [])))
+            for (screen, key), entries in self.entries.items() if screen != ALL_SCREENS
+        }
+
+    def dispatch(self, cmd, screen):
+        """Calls every callback registered for cmd on screen. Returns whether there was any."""
+        key = self.key_names.get(cmd, cmd)
+        callbacks = self.table.get((screen, key)) or self.all_table.get(key)
+        if not callbacks:
+            return False
+        for callback in callbacks:
+            callback()
+        return True
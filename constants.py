@@ -3,19 +3,37 @@
 
 # Useful constants and strings
 
+# Logical keys of the app and the keyboard key codes triggering them
 CEC_CMD_MAP = {
-    "UP": [">> 01:44:01", 273],
-    "DOWN": [">> 01:44:02", 274],
-    "LEFT": [">> 01:44:03", 276],
-    "RIGHT": [">> 01:44:04", 275],
-    "OK": [">> 01:44:00", 13, 1073741824],
-    "RED": [">> 01:44:72", 114],
-    "GREEN": [">> 01:44:73", 103],
-    "YELLOW": [">> 01:44:74", 121],
-    "BLUE": [">> 01:44:71", 98],
-    "EXIT": [">> 01:44:0d", 27],
+    "UP": [273],
+    "DOWN": [274],
+    "LEFT": [276],
+    "RIGHT": [275],
+    "OK": [13, 1073741824],
+    "RED": [114],
+    "GREEN": [103],
+    "YELLOW": [121],
+    "BLUE": [98],
+    "EXIT": [27],
 }
 
+# libCEC user control codes (cec.CEC_USER_CONTROL_CODE_*) of the remote's keys
+CEC_KEY_MAP = {
+    0x00: "OK",
+    0x01: "UP",
+    0x02: "DOWN",
+    0x03: "LEFT",
+    0x04: "RIGHT",
+    0x0d: "EXIT",
+    0x71: "BLUE",
+    0x72: "RED",
+    0x73: "GREEN",
+    0x74: "YELLOW",
+}
+
+# Keys that repeat while they are held on the remote
+CEC_REPEAT_KEYS = ("UP", "DOWN", "LEFT", "RIGHT")
+
 POSITIVES = [
     "Nice!",
     "Great!",
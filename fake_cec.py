@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Stand-in for the python-libcec "cec" module, covering the parts of its API used by
+# cec_control.py. It simulates an adapter on a bus with a TV and a soundbar, and replays
+# scripted remote control input on its own thread, as libCEC does: held keys repeat at
+# a configurable rate, and bus noise (other devices' traffic, key releases and keys the
+# app does not use) can be mixed in. The time every key press is sent is recorded, so
+# that input latency can be measured without a Pi and a TV. Enabled with --fake-cec:
+#
+#     --fake-cec-script=PATH   JSON list of steps played once connected, each one of
+#                              {"key": "DOWN", "hold": 0.5}, {"traffic": ">> 0f:36"}
+#                              or {"wait": 1.5}
+#     --fake-cec-repeat=HZ     Rate at which held keys repeat (default: 10)
+#     --fake-cec-noise=HZ      Rate of bus noise (default: 0)
+#     --fake-cec-seed=SEED     Seed of the bus noise (default: 0)
+
+from collections import deque
+from random import Random
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from constants import CEC_KEY_MAP
+from helpers import get_cli_option
+from logs import get_logger
+
+import json
+
+log = get_logger('cec')
+
+SCRIPT = get_cli_option('--fake-cec-script')
+REPEAT_RATE = float(get_cli_option('--fake-cec-repeat', 10))
+NOISE_RATE = float(get_cli_option('--fake-cec-noise', 0))
+NOISE_SEED = get_cli_option('--fake-cec-seed', 0)
+
+# Constants of the cec module
+CEC_LOG_ERROR = 1
+CEC_LOG_WARNING = 2
+CEC_LOG_NOTICE = 4
+CEC_LOG_TRAFFIC = 8
+CEC_LOG_DEBUG = 16
+CEC_DEVICE_TYPE_RECORDING_DEVICE = 1
+LIBCEC_VERSION_CURRENT = 0x040000
+CECDEVICE_TV = 0
+CECDEVICE_RECORDINGDEVICE1 = 1
+CECDEVICE_AUDIOSYSTEM = 5
+CECDEVICE_BROADCAST = 0xf
+CEC_POWER_STATUS_ON = 0
+CEC_POWER_STATUS_STANDBY = 1
+CEC_POWER_STATUS_UNKNOWN = 0x99
+
+KEY_CODES = {name: code for code, name in CEC_KEY_MAP.items()}
+
+# Traffic of other devices, and key presses the app does not use (numbers, volume, ...)
+NOISE_TRAFFIC = [">> 01:45", ">> 0f:87:00:00:f0", ">> 05:90:00", ">> 5f:72:01", ">> 50:7a:1e", ">> 0f:84:00:00:00",
+                 ">> 05:8f"]
+NOISE_KEYS = [0x21, 0x22, 0x41, 0x42, 0x44]
+
+# name, vendor id, physical address and power status of the simulated devices
+DEVICES = {
+    CECDEVICE_TV: ["TV", 0x00903e, 0x0000, CEC_POWER_STATUS_STANDBY],
+    CECDEVICE_RECORDINGDEVICE1: ["pyLibCec", 0x001582, 0x1000, CEC_POWER_STATUS_ON],
+    CECDEVICE_AUDIOSYSTEM: ["Soundbar", 0x0009b0, 0x2000, CEC_POWER_STATUS_ON],
+}
+
+# The adapter created by ICECAdapter.Create, for scripts and benchmarks driving the fake bus
+adapter = None
+
+
+class DeviceTypeList(list):
+
+    def Add(self, device_type):
+        self.append(device_type)
+
+
+class libcec_configuration:
+
+    def __init__(self):
+        self.strDeviceName = ''
+        self.bActivateSource = 0
+        self.deviceTypes = DeviceTypeList()
+        self.clientVersion = 0
+        self.serverVersion = LIBCEC_VERSION_CURRENT
+        self.log_callback = None
+        self.key_press_callback = None
+        self.command_callback = None
+
+    def SetLogCallback(self, callback):
+        self.log_callback = callback
+
+    def SetKeyPressCallback(self, callback):
+        self.key_press_callback = callback
+
+    def SetCommandCallback(self, callback):
+        self.command_callback = callback
+
+
+class AdapterDescriptor:
+
+    def __init__(self):
+        self.strComName = '/dev/fake-cec'
+        self.iVendorId = 0x2548
+        self.iProductId = 0x1002
+
+
+class AddressSet:
+
+    def __init__(self, addresses):
+        self.addresses = set(addresses)
+
+    def IsSet(self, address):
+        return address in self.addresses
+
+
+class FakeAdapter:
+    """
+    The simulated adapter. Steps are played on the bus thread in the order they are
+    queued, bus noise comes from a thread of its own, like traffic from other devices.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.devices = {address: list(device) for address, device in DEVICES.items()}
+        self.active_source = None
+        self.steps = deque()
+        self.wake = Event()
+        self.opened = Event()
+        self.rng = Random(NOISE_SEED)
+        # (key code, perf_counter) of every key press sent to the app, including repeats
+        self.sent = []
+
+    # Scripting
+
+    def play(self, steps):
+        """Queues the given steps, see the module description."""
+        self.steps.extend(steps)
+        self.wake.set()
+
+    def press(self, name, hold=0):
+        """Queues a press of the key with the given logical name, held for hold seconds."""
+        self.play([{'key': name, 'hold': hold}])
+
+    def run_steps(self):
+        while self.opened.is_set():
+            self.wake.wait()
+            self.wake.clear()
+            while self.steps and self.opened.is_set():
+                step = self.steps.popleft()
+                if 'key' in step:
+                    self.send_key(KEY_CODES[step['key']], step.get('hold', 0))
+                elif 'traffic' in step:
+                    self.send_traffic(step['traffic'])
+                sleep(step.get('wait', 0))
+
+    def run_noise(self):
+        while self.opened.is_set():
+            sleep(self.rng.expovariate(NOISE_RATE))
+            if self.rng.random() < 0.8:
+                self.send_traffic(self.rng.choice(NOISE_TRAFFIC))
+            else:
+                self.send_key(self.rng.choice(NOISE_KEYS), 0)
+
+    def send_key(self, code, hold):
+        """Sends a key press, repeated while it is held, and its release."""
+        start = perf_counter()
+        while True:
+            self.sent.append((code, perf_counter()))
+            if self.config.key_press_callback:
+                self.config.key_press_callback(code, 0)
+            if perf_counter() - start + 1 / REPEAT_RATE > hold:
+                break
+            sleep(1 / REPEAT_RATE)
+        if self.config.key_press_callback:
+            self.config.key_press_callback(code, max(1, int((perf_counter() - start) * 1000)))
+        self.send_traffic(">> 01:45")
+
+    def send_traffic(self, traffic):
+        if self.config.command_callback:
+            self.config.command_callback(traffic)
+
+    # The libCEC API
+
+    def VersionToString(self, version):
+        return "{}.{}.{}".format(version >> 16, (version >> 8) & 0xff, version & 0xff)
+
+    def GetLibInfo(self):
+        return "fake libCEC, scripted input"
+
+    def DetectAdapters(self):
+        return [AdapterDescriptor()]
+
+    def Open(self, port):
+        self.opened.set()
+        Thread(target=self.run_steps, name='fake-cec', daemon=True).start()
+        if NOISE_RATE > 0:
+            Thread(target=self.run_noise, name='fake-cec-noise', daemon=True).start()
+        if SCRIPT:
+            with open(SCRIPT) as f:
+                self.play(json.load(f))
+        log.info("CEC: Fake adapter opened")
+        return True
+
+    def Close(self):
+        self.opened.clear()
+        self.wake.set()
+
+    def PingAdapter(self):
+        return self.opened.is_set()
+
+    def GetActiveDevices(self):
+        return AddressSet(self.devices)
+
+    def GetLogicalAddresses(self):
+        return AddressSet([CECDEVICE_RECORDINGDEVICE1])
+
+    def GetActiveSource(self):
+        return self.active_source
+
+    def IsActiveSource(self, address):
+        return address == self.active_source
+
+    def GetDeviceVendorId(self, address):
+        return self.devices[address][1]
+
+    def GetDevicePhysicalAddress(self, address):
+        return self.devices[address][2]
+
+    def GetDeviceCecVersion(self, address):
+        return 5
+
+    def GetDevicePowerStatus(self, address):
+        return self.devices[address][3]
+
+    def GetDeviceOSDName(self, address):
+        return self.devices[address][0]
+
+    def SetActiveSource(self):
+        self.active_source = CECDEVICE_RECORDINGDEVICE1
+        self.send_traffic("<< 1f:82:10:00")
+        return True
+
+    def PowerOnDevices(self, address):
+        self.devices[address][3] = CEC_POWER_STATUS_ON
+        self.send_traffic("<< 1{:x}:04".format(address))
+        return True
+
+    def StandbyDevices(self, address):
+        for device in self.devices.values():
+            device[3] = CEC_POWER_STATUS_STANDBY
+        return True
+
+    def CommandFromString(self, data):
+        return data
+
+    def Transmit(self, cmd):
+        return True
+
+    def LogicalAddressToString(self, address):
+        return {CECDEVICE_TV: "TV", CECDEVICE_RECORDINGDEVICE1: "Recorder 1",
+                CECDEVICE_AUDIOSYSTEM: "Audio"}.get(address, "Unknown")
+
+    def VendorIdToString(self, vendor):
+        return hex(vendor)
+
+    def CecVersionToString(self, version):
+        return "1.4"
+
+    def PowerStatusToString(self, power):
+        return {CEC_POWER_STATUS_ON: "on", CEC_POWER_STATUS_STANDBY: "standby"}.get(power, "unknown")
+
+
+class ICECAdapter:
+
+    @staticmethod
+    def Create(config):
+        global adapter
+        adapter = FakeAdapter(config)
+        return adapter
@@ -7,7 +7,7 @@ from kivy.lang import Builder
 from kivy.graphics import Color
 from time import sleep
 from kivy.logger import Logger
-from kivy.clock import Clock, mainthread
+from kivy.clock import Clock
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.floatlayout import FloatLayout
@@ -23,12 +23,20 @@ from kivy.properties import NumericProperty, ListProperty, StringProperty, Boole
 
 
 from random import shuffle, choice, randint
-from functools import partial
+from time import perf_counter
 
-from helpers import get_categories, get_verdict
+from helpers import get_categories, get_verdict, get_cli_option
 from trivia import Trivia
+from question_cache import QuestionCache
+from command_dispatch import CommandDispatcher, ALL_SCREENS
+from logs import get_logger, is_debug
+from profiler import FrameProfiler
+from latency import LatencyTracker
+from stall_watchdog import StallWatchdog
+from idle import IdleManager
+from text_cache import CachedTextMixin
 from soundmachine import SoundMachine
-from screens import TitleScreen, Intro, Options, Instructions, Credits, Game, Score
+from screens import LazyScreenManager, TitleScreen, Intro, Options, Instructions, Credits, Game, Score
 from simple_widgets import AlphaWidget, RoundedBox, PlayOrOptions, PressOK, PressColor
 from scrollmenu import ScrollMenu, FreeScrollView, ScrollAwareLayout, OptionButton, OptionIndicator
 from constants import CEC_CMD_MAP, INSTRUCTION_TEXT
@@ -36,12 +44,43 @@ from constants import CEC_CMD_MAP, INSTRUCTION_TEXT
 import json
 import sys
 
+log = get_logger('app')
+input_log = get_logger('input')
+INPUT_DEBUG = is_debug(input_log)
 
 # Pass cli arguments
 
 DISABLE_CEC = True if '--disable-cec' in sys.argv else False
 USE_SAMPLE_DATA = True if '--use-sample-data' in sys.argv else False
 SET_SIZE = True if '--set-size' in sys.argv else False
+DISABLE_CACHE = True if '--disable-cache' in sys.argv else False
+CACHE_FIRST = True if '--cache-first' in sys.argv else False
+CACHE_TTL = float(get_cli_option('--cache-ttl', 7*24)) * 3600
+CACHE_SIZE = int(get_cli_option('--cache-size', 5000))
+MUSIC_UNLOAD_DELAY = float(get_cli_option('--music-unload-delay', 30))
+SFX_VOICES = int(get_cli_option('--sfx-voices', 3))
+ANSWER_SEED = get_cli_option('--answer-seed')
+PROFILE = True if '--profile' in sys.argv else False
+PROFILE_CSV = get_cli_option('--profile-csv', 'frame_profile.csv')
+IDLE_TIMEOUT = float(get_cli_option('--idle-timeout', 5)) * 60
+IDLE_FPS = int(get_cli_option('--idle-fps', 5))
+KEY_REPEAT_DELAY = float(get_cli_option('--key-repeat-delay', 0.4))
+KEY_REPEAT_INTERVAL = float(get_cli_option('--key-repeat-interval', 0.2))
+KEY_REPEAT_MIN_INTERVAL = float(get_cli_option('--key-repeat-min-interval', 0.05))
+CEC_NO_WAKE = True if '--cec-no-wake' in sys.argv else False
+FAKE_CEC = True if '--fake-cec' in sys.argv else False
+LATENCY = True if '--latency' in sys.argv else False
+LATENCY_CSV = get_cli_option('--latency-csv', 'latency.csv')
+STALL_THRESHOLD = float(get_cli_option('--stall-threshold', 2))
+STALL_LOG = get_cli_option('--stall-log', 'stall.log')
+
+# Screens on which the YELLOW button toggles the profiler overlay (it is an answer button in the game)
+PROFILER_SCREENS = ['intro', 'options', 'score', 'instructions', 'credits']
+
+# Number of times a failed question fetch is retried, and the delay before the first retry
+# (doubled for every further attempt).
+FETCH_RETRIES = 3
+FETCH_RETRY_DELAY = 1
 
 # Backend settings
 
@@ -62,59 +101,76 @@ class GameButtons(Widget):
 
     game_root = ObjectProperty()
 
-    def anim_all(self, direction, highlight=None, callback=None):
-
-        # Check if we're animating in or out
-        if direction == "in":
-            anim_func = self.anim_in
-        else:
-            anim_func = self.anim_out
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Button animations are built once and restarted for every question, see get_button_anim
+        self.anims = {}
+        self.highlight_anim = Animation(opacity=0, scale=1.5, duration=0.6)
+        self.callback_anim = None
+        self.callback = None
 
-        # Set start timer to 0
-        time_start = 0
+    def anim_all(self, direction, highlight=None, callback=None):
 
         # Check what buttons need to be animated which way (to highlight answer)
         # Only really intended to be used for the fade OUT animation!
         col_list = ['red', 'green', 'yellow', 'blue'] if len(App.get_running_app().curr_btn_labels) > 2 else ['red', 'green']
         col_needed = [col for col in col_list if col is not highlight] if highlight else col_list
-        
-        # Check if a button is to be highlighted (ie
-        if highlight:
-            Animation(opacity=0, scale=1.5, duration=0.6).start(self.ids['btn_' + highlight])
-
-        for index, color in enumerate(col_needed):
-
-            # "Normal" animation
-            if callback is None or index < (len(col_needed)-1):
-                Clock.schedule_once(partial(anim_func, btn=self.ids['btn_' + color], callback=None), time_start)
-            else:
-                # We want to attach any potential callback to the last button animation
-                Clock.schedule_once(partial(anim_func, btn=self.ids['btn_' + color], callback=callback), time_start)
-            time_start += 0.1
 
         if direction == "in":
             for color in col_list:
                 self.ids['btn_' + color].stop_effect_anims()
-                Clock.schedule_once(self.ids['btn_' + color].effect_anim, 0.7)
+                self.ids['btn_' + color].schedule_effect(self.game_root.timeline, 0.7)
+        
+        # Check if a button is to be highlighted (ie
+        if highlight:
+            self.highlight_anim.start(self.ids['btn_' + highlight])
 
+        # All buttons start animating right away, the 0.1 s offsets between them are part of
+        # their animations. We want to attach any potential callback to the last button animation.
+        for index, color in enumerate(col_needed):
+            anim = self.get_button_anim(direction, self.ids['btn_' + color], index * 0.1)
+            if callback and index == len(col_needed) - 1:
+                self.callback_anim = anim
+                self.callback = callback
+            anim.start(self.ids['btn_' + color])
 
-    def test_func(self, *args, **kwargs):
-        print('The flexible function has *args of', str(args),
-            "and **kwargs of", str(kwargs))
+    def stop_effect_anims(self):
+        for color in ['red', 'green', 'yellow', 'blue']:
+            self.ids['btn_' + color].stop_effect_anims()
 
-    def anim_in(self, dt, btn, callback=None):
-        anim = Animation(pos_hint={'center_x': btn.primary_position[0], 'center_y': btn.primary_position[1]}, scale=1,
-                  t='out_elastic', duration=1)
-        if callback:
-            anim.bind(on_complete=lambda anim, widget: callback())
-        anim.start(btn)
+    @staticmethod
+    def get_btn_size_hint(answers):
+        """Returns the size_hint of the buttons for a question with the given number of answers."""
+        return (0.49, 0.47) if answers > 2 else (0.49, 0.70)
 
-    def anim_out(self, dt, btn, callback=None):
-        anim = Animation(pos_hint={'center_x': btn.secondary_position_2[0], 'center_y': btn.secondary_position_2[1]}, scale=btn.secondary_scale_2,
-                  t='in_circ', duration=0.5)
-        if callback:
-            anim.bind(on_complete=lambda anim, widget: callback())
-        anim.start(btn)
+    def get_button_anim(self, direction, btn, delay):
+        """
+        Returns the (pooled) animation moving btn in or out after delay seconds. The
+        animations are only rebuilt if the button's target position changes, which happens
+        when switching between multiple choice and true/false questions.
+        """
+        key = (direction, btn.base_color, delay, tuple(btn.primary_position), tuple(btn.secondary_position_2),
+               btn.secondary_scale_2)
+        anim = self.anims.get(key)
+        if anim is None:
+            if direction == "in":
+                anim = Animation(pos_hint={'center_x': btn.primary_position[0], 'center_y': btn.primary_position[1]}, scale=1,
+                                 t='out_elastic', duration=1)
+            else:
+                anim = Animation(pos_hint={'center_x': btn.secondary_position_2[0], 'center_y': btn.secondary_position_2[1]}, scale=btn.secondary_scale_2,
+                                 t='in_circ', duration=0.5)
+            if delay:
+                anim = Animation(duration=delay) + anim
+            anim.bind(on_complete=self.on_button_anim_complete)
+            self.anims[key] = anim
+        return anim
+
+    def on_button_anim_complete(self, anim, widget):
+        if anim is self.callback_anim and self.callback:
+            callback = self.callback
+            self.callback_anim = None
+            self.callback = None
+            callback()
 
     def reset_pos(self):
         for color in ['red', 'green', 'yellow', 'blue']:
@@ -123,7 +179,7 @@ class GameButtons(Widget):
             btn.pos_hint = {'center_x': btn.secondary_position_1[0], 'center_y': btn.secondary_position_1[1]}
             btn.scale = btn.secondary_scale_2
 
-class TriviaButton(Button):
+class TriviaButton(CachedTextMixin, Button):
 
     scale = NumericProperty()
     x_transform = NumericProperty()
@@ -140,19 +196,35 @@ class TriviaButton(Button):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.anim = None
+        self.anim_width = None
         self.anim_scheduler = None
+        self.timeline = None
+        self.effect_paused = False
+        self.idle_manager = App.get_running_app().idle_manager
+        self.idle_manager.bind(idle=self.on_app_idle)
+
+    @staticmethod
+    def get_text_size(width, height):
+        """Returns the text_size of a button of the given size."""
+        return width*0.9, height*0.9
 
     def stop_effect_anims(self):
         """
         Stops the special effect animation of the button. This involves cancelling any
-        ongoing animation and / or unscheduling scheduled animations that have been set
-        by the reschedule method.
+        ongoing animation and / or dropping the animation's cue from the timeline.
         """
-        Animation.cancel_all(self)
+        Animation.cancel_all(self, 'x_transform')
         if self.anim_scheduler:
-            self.anim_scheduler.cancel()
+            self.timeline.cancel(self.anim_scheduler)
+            self.anim_scheduler = None
+        self.effect_paused = False
         self.reset_pos()
 
+    def schedule_effect(self, timeline, delay):
+        """Starts the special effect animation after delay seconds, keeping it going on the given timeline."""
+        self.timeline = timeline
+        self.anim_scheduler = timeline.at(delay, self.effect_anim)
+
     def effect_anim(self, anim=None, widget=None):
         """
         Starts the special effect animation of the TriviaButton.
@@ -161,9 +233,15 @@ class TriviaButton(Button):
         as the animation is stopped and restarted after every question (and hence the animation
         gets restarted using the correct self.width). So, the use of an on_width trigger is not
         really necessary.
+        While the app is idle, the effect is only marked as paused, on_app_idle starts it.
         """
-        self.anim = Animation(x_transform=self.width+20, duration=1)
-        self.anim.bind(on_complete=self.reschedule)
+        if self.idle_manager.idle:
+            self.effect_paused = True
+            return
+        if self.anim is None or self.anim_width != self.width:
+            self.anim = Animation(x_transform=self.width+20, duration=1)
+            self.anim.bind(on_complete=self.reschedule)
+            self.anim_width = self.width
         self.anim.start(self)
 
     def reschedule(self, anim=None, widget=None):
@@ -171,20 +249,34 @@ class TriviaButton(Button):
         After the special animation has run once, this callback is called to reschedule
         it at a random time, so that there is a slight offset for the effect among the 
         TriviaButtons.
-        A reference for the clock object is kept so that Animation can be cancelled, as
+        A reference for the cue is kept so that Animation can be cancelled, as
         Animation.cancel_all will only catch current animations, but not the scheduled ones.
         """
         self.reset_pos()
-        self.anim_scheduler = Clock.schedule_once(self.reanim, randint(20, 40)/10)
+        if self.timeline:
+            self.anim_scheduler = self.timeline.at(randint(20, 40)/10, self.reanim)
 
-    def reanim(self, dt=None):
-        """Convenience function to swallow the dt argumemt of Clock callbacks."""
+    def reanim(self):
+        self.anim_scheduler = None
+        if self.idle_manager.idle:
+            self.effect_paused = True
+            return
         self.anim.start(self)
 
     def reset_pos(self):
         """Resets the special effect animation to its initial settings."""
         self.x_transform = -20
 
+    def on_app_idle(self, manager, idle):
+        """Stops the special effect animation while the app is idle, and restarts it afterwards."""
+        if idle:
+            running = self.anim_scheduler is not None or (self.anim is not None and self.anim.have_properties_to_animate(self))
+            self.stop_effect_anims()
+            self.effect_paused = running
+        elif self.effect_paused:
+            self.schedule_effect(self.timeline, 0.7)
+            self.effect_paused = False
+
 
 class AnswerFeedbackLabel(Label):
 
@@ -196,18 +288,28 @@ class AnswerFeedbackLabel(Label):
     secondary_scale = NumericProperty()
     sentiment = StringProperty()
 
-    def animate(self):
-        anim_opacity = Animation(opacity=1, duration=0.5) + Animation(opacity=0, duration=0.5)
-        anim_scale = Animation(scale=self.secondary_scale, angle=self.secondary_angle, duration=1)
-        anim_full = anim_opacity & anim_scale
-        anim_full.bind(on_complete=self.reset_pos)
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.anims = {}
+
+    def animate(self, delay=0):
+        """Shows the feedback, after delay seconds. The animation is built once per delay and reused."""
+        anim_full = self.anims.get(delay)
+        if anim_full is None:
+            anim_opacity = Animation(opacity=1, duration=0.5) + Animation(opacity=0, duration=0.5)
+            anim_scale = Animation(scale=self.secondary_scale, angle=self.secondary_angle, duration=1)
+            anim_full = anim_opacity & anim_scale
+            if delay:
+                anim_full = Animation(duration=delay) + anim_full
+            anim_full.bind(on_complete=self.reset_pos)
+            self.anims[delay] = anim_full
         anim_full.start(self)
 
     def reset_pos(self, anim=None, widget=None):
         self.scale = self.primary_scale
         self.angle = self.primary_angle
 
-class QuestionLabel(Label):
+class QuestionLabel(CachedTextMixin, Label):
 
     secondary_position_1 = ListProperty()
     secondary_position_2 = ListProperty()
@@ -260,6 +362,8 @@ class ScrollLabel(ScrollView):
         self.next_label_text = None
         self.scroll_anim = None
         self.scroll_anim_scheduler = None
+        self.idle_manager = App.get_running_app().idle_manager
+        self.idle_manager.bind(idle=self.on_app_idle)
 
     def on_label_text(self, widget, label_text):
         """
@@ -297,11 +401,13 @@ class ScrollLabel(ScrollView):
 
     def fade_in_animation(self, dt=None):
         """
-        Starts the fade in animation.
+        Starts the fade in animation. While the app is idle, scrolling only starts once the
+        idle mode ends (see on_app_idle).
         """
         self.scroll_anim = Animation(scroll_x=1, duration=(self.ids.scrollable_label.width / 300))
         self.scroll_anim.bind(on_complete=self.scroll_reschedule)
-        self.scroll_anim.start(self)
+        if not self.idle_manager.idle:
+            self.scroll_anim.start(self)
         Animation(opacity=1, duration=0.2).start(self)
         
     def scroll_reschedule(self, anim=None, widget=None):
@@ -315,7 +421,8 @@ class ScrollLabel(ScrollView):
         """
         Convenience function to restart the scroll animation.
         """
-        self.scroll_anim.start(self)
+        if not self.idle_manager.idle:
+            self.scroll_anim.start(self)
 
     def reset_pos(self, *args):
         """
@@ -323,6 +430,18 @@ class ScrollLabel(ScrollView):
         """
         self.scroll_x = 0
 
+    def on_app_idle(self, manager, idle):
+        """
+        Stops scrolling while the app is idle, and starts over afterwards.
+        """
+        if idle:
+            if self.scroll_anim_scheduler:
+                self.scroll_anim_scheduler.cancel()
+            Animation.cancel_all(self, 'scroll_x')
+        elif self.scroll_anim:
+            self.reset_pos()
+            self.scroll_anim.start(self)
+
 
 class Category(BoxLayout):
 
@@ -339,8 +458,6 @@ class Feduquiz(App):
 
     bg_col = ListProperty([0, 0, 0])
 
-    trivia = Trivia(USE_SAMPLE_DATA)
-
     curr_question = StringProperty()
     curr_author = StringProperty()
     curr_type = StringProperty()
@@ -370,7 +487,17 @@ class Feduquiz(App):
         super().__init__(**kwargs)
         self.categories = get_categories()
         self.bind(opt_api=self.update_categories)
-        self.fps_event = Clock.schedule_interval(self.print_fps, 1/2.0)
+        cache = None
+        if not DISABLE_CACHE:
+            cache = QuestionCache(ttl=CACHE_TTL, max_size=CACHE_SIZE,
+                                  categories={backend["url"]: backend["categories"] for backend in BACKENDS.values()})
+        self.trivia = Trivia(USE_SAMPLE_DATA, cache=cache, cache_first=CACHE_FIRST, answer_seed=ANSWER_SEED)
+        self.trivia.bind(on_game_ready=self.on_game_ready,
+                         on_fetch_failed=self.on_fetch_failed,
+                         on_fetch_timeout=self.on_fetch_failed)
+        self.loading_game = False
+        self.fetch_attempt = 0
+        self.retry_event = None
         self.sm = None
         self.bg_anim = (Animation(bg_col=[1,0,0], duration=2) +
                 Animation(bg_col=[1,1,0], duration=2) +
@@ -379,13 +506,30 @@ class Feduquiz(App):
                 Animation(bg_col=[1, 0, 1], duration=2))
         self.bg_anim.repeat = True
 
-        self.snd_machine = SoundMachine()
+        # Suspends the endless animations and lowers the frame rate when nobody is around
+        self.idle_manager = IdleManager(IDLE_TIMEOUT, IDLE_FPS)
+        self.idle_manager.bind(idle=self.on_app_idle)
+
+        self.snd_machine = SoundMachine(music_unload_delay=MUSIC_UNLOAD_DELAY, sfx_voices=SFX_VOICES)
         #self.bg_anim.start(self)   # Will be started by first screen (Intro)
 
-        self.callbacks = []
+        self.dispatcher = CommandDispatcher()
 
         # Register EXIT and SCREENSHOT handler
-        self.add_callback(CEC_CMD_MAP["EXIT"], "ALL", lambda: App.get_running_app().stop())
+        self.add_callback(CEC_CMD_MAP["EXIT"], ALL_SCREENS, lambda: App.get_running_app().stop())
+
+        # Frame time instrumentation
+        self.profiler = None
+        if PROFILE:
+            self.profiler = FrameProfiler(self)
+            for screen in PROFILER_SCREENS:
+                self.add_callback(CEC_CMD_MAP["YELLOW"], screen, self.profiler.toggle_overlay)
+
+        # Input to frame latency instrumentation
+        self.latency = LatencyTracker() if LATENCY else None
+
+        # Main loop stall detection, started with the main loop
+        self.watchdog = None
 
         # Set window size if instructed
         if SET_SIZE:
@@ -399,75 +543,178 @@ class Feduquiz(App):
 
         # initialise libCEC
         if not DISABLE_CEC:
-            from cec_control import pyCecClient
+            if FAKE_CEC:
+                # Simulated adapter and bus, see fake_cec.py
+                import fake_cec
+                sys.modules['cec'] = fake_cec
+            from cec_control import pyCecClient, CecConnection, CecDeviceRegistry
+            from cec_input import CecInput
+            self.cec_input = CecInput(lambda cmd, timestamp: self.command_callback(cmd, 'cec', timestamp),
+                                      repeat_delay=KEY_REPEAT_DELAY,
+                                      repeat_interval=KEY_REPEAT_INTERVAL,
+                                      min_repeat_interval=KEY_REPEAT_MIN_INTERVAL)
             self.lib = pyCecClient()
-            self.lib.SetCommandCallback(lambda cmd: self.command_callback(cmd, 'cec'))
+            self.lib.SetKeyPressCallback(self.cec_input.receive_key)
+            self.cec_devices = CecDeviceRegistry(self.lib)
+            self.lib.SetCommandCallback(self.cec_devices.on_command)
+            self.cec_woken = CEC_NO_WAKE
 
-            # initialise libCEC and enter the main loop
-            self.lib.InitLibCec()
+            # initialise libCEC in the background, the keyboard works in the meantime
+            self.cec = CecConnection(self.lib, on_state=self.on_cec_state)
+            self.cec.start()
+
+    def on_cec_state(self, state):
+        """
+        Called on the CEC thread. Once connected, the bus is scanned and, the first time,
+        the TV is switched on and to the quiz, all in the background.
+        """
+        from cec_control import CONNECTED
+        if state == CONNECTED:
+            self.cec_devices.scan()
+            if not self.cec_woken:
+                self.cec_woken = True
+                self.cec_devices.power_on_tv()
+                self.cec_devices.make_active_source()
 
     def build(self):
-        self.sm = ScreenManager(transition=NoTransition())
+        # Only the intro is needed for the first frame, the other screens are built on first
+        # use or once the intro animation is over.
+        self.sm = LazyScreenManager(transition=NoTransition())
         self.sm.add_widget(Intro(name='intro'))
-        self.sm.add_widget(Game(name='game'))
-        self.sm.add_widget(Score(name='score'))
-        self.sm.add_widget(Options(name='options'))
-        self.sm.add_widget(Instructions(name='instructions'))
-        self.sm.add_widget(Credits(name='credits'))
+        self.sm.register('game', Game)
+        self.sm.register('score', Score)
+        self.sm.register('options', Options)
+        self.sm.register('instructions', Instructions)
+        self.sm.register('credits', Credits)
         return self.sm
 
+    def on_start(self):
+        if STALL_THRESHOLD > 0:
+            self.watchdog = StallWatchdog(self, STALL_THRESHOLD, STALL_LOG)
+
+    def on_stop(self):
+        if self.watchdog:
+            self.watchdog.stop()
+        if not DISABLE_CEC:
+            # Stop using the bus before the connection closes the adapter
+            self.cec_devices.stop()
+            self.cec.stop()
+            self.cec_input.stop()
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.export_csv(PROFILE_CSV)
+        if self.latency:
+            self.latency.stop()
+            self.latency.dump()
+            self.latency.export_csv(LATENCY_CSV)
+        if self.trivia.cache:
+            self.trivia.cache.close()
+
     def update_categories(self, property, api):
         self.categories = BACKENDS[api]["categories"]
 
     def load_game(self, anim=None, widget=None):
+        """Requests a new game. The game screen is shown as soon as Trivia signals it is ready."""
+        self.cancel_retry()
+        self.loading_game = True
+        self.fetch_attempt = 0
+        self.request_game()
+
+    def request_game(self, dt=None):
+        self.retry_event = None
+        if not self.loading_game:
+            return
         self.trivia.new_game(BACKENDS[self.opt_api]["url"], self.opt_difficulty, self.opt_category, self.opt_amount, self.opt_type)
-        Clock.schedule_once(self.check_switch_screen)
 
-    def check_switch_screen(self, dt=None):
-        if not self.trivia.running:
-            Clock.schedule_once(self.check_switch_screen)
+    def on_game_ready(self, trivia):
+        if not self.loading_game:
             return
+        self.cancel_retry()
+        self.loading_game = False
         self.sm.current = 'game'
         self.snd_machine.mode_game()
 
+    def on_fetch_failed(self, trivia, reason=None):
+        """Retries fetching the game with exponential backoff, and gives up after FETCH_RETRIES attempts."""
+        if not self.loading_game:
+            return
+        if self.fetch_attempt < FETCH_RETRIES:
+            delay = FETCH_RETRY_DELAY * 2 ** self.fetch_attempt
+            self.fetch_attempt += 1
+            log.warning("Feduquiz: Retrying to fetch game in %s seconds (attempt %s of %s)", delay, self.fetch_attempt, FETCH_RETRIES)
+            self.retry_event = Clock.schedule_once(self.request_game, delay)
+        else:
+            log.error("Feduquiz: Giving up fetching game")
+            self.cancel_retry()
+            self.loading_game = False
+            self.return_to_options()
+
+    def cancel_retry(self):
+        """Drops the pending retry of a failed fetch, if any."""
+        if self.retry_event:
+            self.retry_event.cancel()
+            self.retry_event = None
+
+    def return_to_options(self):
+        """Shows the options screen again, for instance to let the player pick other game settings."""
+        if self.sm.current == 'options':
+            # The options screen has faded out its widgets when the game was requested
+            self.sm.current_screen.dispatch('on_pre_enter')
+            self.sm.current_screen.dispatch('on_enter')
+        else:
+            self.goto_screen(s_name='options')
+
+    def on_app_idle(self, manager, idle):
+        if idle:
+            manager.pause_animation(self.bg_anim, self)
+
     def goto_screen(self, dt=None, s_name=None):
         if s_name:
             self.sm.current = s_name
             self.snd_machine.mode_menu()
 
-    @mainthread
-    def command_callback(self, cmd, origin):
-        """Callback function for the CEC module"""
-        print("{} command received: {}".format(origin, cmd))
-        current = self.sm.current
-        match = False
-        for callback in self.callbacks:
-            if cmd in callback[0] and (callback[1] == "ALL" or current == callback[1]):
-                callback[2]()
-                match = True
-                print("Callback executed")
-        return match
-
+    def command_callback(self, cmd, origin, timestamp=None):
+        """
+        Dispatches a remote control or keyboard command to the current screen. Must be called
+        on the UI thread, CEC commands are handed over by CecInput. timestamp is the time
+        (perf_counter) the command was received, for the latency instrumentation.
+        """
+        if INPUT_DEBUG:
+            input_log.debug("Input: %s command received: %s", origin, cmd)
+        self.idle_manager.touch()
+        screen = self.sm.current
+        dispatched_at = perf_counter() if self.latency else None
+        handled = self.dispatcher.dispatch(cmd, screen)
+        if handled and self.latency and timestamp is not None:
+            self.latency.dispatched(timestamp, dispatched_at, screen, origin)
+        return handled
+
+    def add_callback(self, cmd, screen, callback, priority=0):
+        """
+        Adds a callback within the app. Returns a handle which can be used to remove it again.
+        See CommandDispatcher.add for details.
+        """
+        if INPUT_DEBUG:
+            input_log.debug("Input: Adding callback %s for screen %s for command %s", callback, screen, cmd)
+        return self.dispatcher.add(cmd, screen, callback, priority)
 
-    def add_callback(self, cmd, screen, callback):
-        """Adds a callback within the app."""
-        print("Adding callback " + str(callback) + " for screen " + screen + " for command " + str(cmd))
-        self.callbacks.append([cmd, screen, callback])
+    def remove_callback(self, handle):
+        """Removes a callback previously added with add_callback."""
+        self.dispatcher.remove(handle)
 
 
     def _on_keyboard_down(self, window, keycode, scancode, text, modifiers, **kwargs):
-        print('The key {} {} {} has been pressed'.format(keycode, 'with text '+text if text else '', 'and modifiers '+str(modifiers) if len(modifiers)>0 else ''))
+        timestamp = perf_counter()
+        if INPUT_DEBUG:
+            input_log.debug("Input: The key %s %s %s has been pressed", keycode, 'with text '+text if text else '',
+                            'and modifiers '+str(modifiers) if len(modifiers)>0 else '')
 
         # Call callback
-        return self.command_callback(keycode, 'keyboard')
+        return self.command_callback(keycode, 'keyboard', timestamp)
 
         # Return True to accept the key. Otherwise, it will be used by
         # the system.
         #return True
-        
-    def print_fps(self, *args):
-        fps = Clock.get_fps()
-        print("{} Fps    ".format(int(fps)), end='\r')
 
 if __name__ == '__main__':
     Feduquiz().run()
\ No newline at end of file
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import json
+import sys
 
 def get_verdict(score):
     if score == 1:              # 100 %
@@ -29,5 +30,12 @@ def get_categories():
     result = [['All', 0]]
     for cat_pair in parsed:
         result.append([cat_pair['name'], cat_pair['id']])
-    print(result)
-    return result
\ No newline at end of file
+    return result
+
+def get_cli_option(name, default=None):
+    """Returns the value of a "--name=value" style CLI argument, or default if it was not given."""
+    prefix = name + '='
+    for arg in sys.argv:
+        if arg.startswith(prefix):
+            return arg[len(prefix):]
+    return default
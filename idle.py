@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy import __version__ as kivy_version
+from kivy.clock import Clock
+from kivy.event import EventDispatcher
+from kivy.properties import BooleanProperty
+
+from logs import get_logger
+
+log = get_logger('app')
+
+# Kivy reads the maxfps setting only once, when its Clock is created, and offers no public
+# way to change the frame rate later on. The idle mode therefore sets the Clock's private
+# _max_fps, which it reads every frame. This is a deliberate dependency on Kivy's
+# internals, checked against Kivy 1.10 to 2.3: on other versions, or if the attribute is
+# gone, the frame rate is left alone and only the animations are suspended.
+KIVY_MAJOR = int(kivy_version.split('.')[0])
+CAN_LIMIT_FPS = 1 <= KIVY_MAJOR <= 2 and hasattr(Clock, '_max_fps')
+
+
+class IdleManager(EventDispatcher):
+    """
+    Switches the app to idle mode when no input has been received for a while. Widgets
+    with endless animations bind to the idle property to suspend them while nobody is
+    watching (see pause_animation), and start them through start_animation, so that
+    animations started while idle wait for the idle mode to end. The manager also lowers
+    the Clock's frame rate. The next input (see touch) ends the idle mode.
+    """
+
+    idle = BooleanProperty(False)
+
+    def __init__(self, timeout=300, idle_fps=5, **kwargs):
+        """
+        :param timeout: Seconds without input after which the app becomes idle, 0 disables the idle mode.
+        :param idle_fps: Maximum frame rate while idle.
+        """
+        super().__init__(**kwargs)
+        self.idle_fps = idle_fps
+        self.active_fps = Clock._max_fps if CAN_LIMIT_FPS else None
+        self.idle_trigger = Clock.create_trigger(self.go_idle, timeout) if timeout > 0 else None
+        self.paused = []
+        self.touch()
+
+    def touch(self):
+        """Records an input, ending the idle mode and restarting the countdown to the next one."""
+        if self.idle:
+            self.idle = False
+        if self.idle_trigger:
+            self.idle_trigger.cancel()
+            self.idle_trigger()
+
+    def pause_animation(self, anim, widget):
+        """
+        Stops anim on widget, without completing it, until the idle mode ends. Animations
+        that are not running are left alone.
+        """
+        if anim is not None and anim.have_properties_to_animate(widget):
+            anim.cancel(widget)
+            self.paused.append((anim, widget))
+
+    def start_animation(self, anim, widget):
+        """Starts anim on widget, or, while idle, once the idle mode ends."""
+        if self.idle:
+            self.paused.append((anim, widget))
+        else:
+            anim.start(widget)
+
+    def go_idle(self, dt=None):
+        self.idle = True
+
+    def on_idle(self, instance, idle):
+        if idle:
+            log.info("Idle: No input received, suspending animations and limiting frame rate to %s fps", self.idle_fps)
+            if CAN_LIMIT_FPS:
+                self.active_fps = Clock._max_fps
+                Clock._max_fps = self.idle_fps
+            else:
+                log.warning("Idle: Cannot limit the frame rate with Kivy %s", kivy_version)
+        else:
+            log.info("Idle: Input received, resuming")
+            if CAN_LIMIT_FPS:
+                Clock._max_fps = self.active_fps
+            paused, self.paused = self.paused, []
+            for anim, widget in paused:
+                anim.start(widget)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy.core.window import Window
+
+from time import perf_counter
+
+from logs import get_logger
+
+import csv
+
+log = get_logger('input')
+
+
+class LatencyHistogram:
+    """Counts latencies in buckets of bucket_ms milliseconds, the last bucket takes everything above."""
+
+    def __init__(self, bucket_ms=5, buckets=100):
+        self.bucket_ms = bucket_ms
+        self.counts = [0] * buckets
+        self.total = 0
+        self.sum_ms = 0
+        self.max_ms = 0
+
+    def add(self, latency_ms):
+        index = min(len(self.counts) - 1, int(latency_ms // self.bucket_ms))
+        self.counts[index] += 1
+        self.total += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given percentile (0. - 1.), in milliseconds."""
+        if not self.total:
+            return 0
+        rank = fraction * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return (index + 1) * self.bucket_ms
+        return self.max_ms
+
+    def mean(self):
+        return self.sum_ms / self.total if self.total else 0
+
+
+class LatencyTracker:
+    """
+    Measures the time from receiving an input to the first frame drawn after it has been
+    handled. Inputs are timestamped where they enter the app (libCEC's callback thread for
+    the remote, the key down event for the keyboard), and reported by command_callback
+    once they have been handled, together with the screen that handled them and the time
+    their dispatch started. The next flip of the window then closes their measurement.
+    Latencies are kept in histograms per screen and input origin, along with the time
+    until dispatch, which inputs spend waiting for the UI thread, and the time the
+    screen's handlers took, which tells both apart from the time it takes to draw them.
+    """
+
+    CSV_HEADER = ('screen', 'origin', 'measure', 'bucket_ms', 'count')
+
+    def __init__(self, bucket_ms=5, buckets=100):
+        self.bucket_ms = bucket_ms
+        self.buckets = buckets
+        # (screen, origin) -> histogram, for the whole latency, the part until dispatch and
+        # the time spent in the handlers
+        self.to_frame = {}
+        self.to_dispatch = {}
+        self.in_handler = {}
+        # (ingress timestamp, screen, origin) of the inputs dispatched since the last frame
+        self.pending = []
+        Window.bind(on_flip=self.on_flip)
+
+    def get_histogram(self, histograms, key):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = LatencyHistogram(self.bucket_ms, self.buckets)
+        return histogram
+
+    def dispatched(self, timestamp, dispatched_at, screen, origin):
+        """
+        Records an input received at timestamp, whose dispatch started at dispatched_at (both
+        perf_counter) and which has just been handled on screen.
+        """
+        key = (screen, origin)
+        self.get_histogram(self.to_dispatch, key).add((dispatched_at - timestamp) * 1000)
+        self.get_histogram(self.in_handler, key).add((perf_counter() - dispatched_at) * 1000)
+        self.pending.append((timestamp, screen, origin))
+
+    def on_flip(self, *args):
+        if not self.pending:
+            return
+        now = perf_counter()
+        for timestamp, screen, origin in self.pending:
+            self.get_histogram(self.to_frame, (screen, origin)).add((now - timestamp) * 1000)
+        self.pending = []
+
+    def dump(self):
+        """Logs a summary of the recorded latencies."""
+        for (screen, origin), histogram in sorted(self.to_frame.items()):
+            dispatch = self.to_dispatch[(screen, origin)]
+            handler = self.in_handler[(screen, origin)]
+            log.info("Latency: %s, %s: %s inputs, to frame p50 %s ms, p95 %s ms, max %.1f ms, to dispatch mean %.1f ms, "
+                     "in handler mean %.1f ms", screen, origin, histogram.total, histogram.percentile(0.5),
+                     histogram.percentile(0.95), histogram.max_ms, dispatch.mean(), handler.mean())
+
+    def export_csv(self, path):
+        try:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.CSV_HEADER)
+                for measure, histograms in (('frame', self.to_frame), ('dispatch', self.to_dispatch),
+                                            ('handler', self.in_handler)):
+                    for (screen, origin), histogram in sorted(histograms.items()):
+                        writer.writerows((screen, origin, measure, index * self.bucket_ms, count)
+                                         for index, count in enumerate(histogram.counts) if count)
+        except OSError as exc:
+            log.error("Latency: Could not write %s: %s", path, exc)
+            return
+        log.info("Latency: Wrote latency histograms to %s", path)
+
+    def stop(self):
+        Window.unbind(on_flip=self.on_flip)
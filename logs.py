@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Per-subsystem loggers, all children of Kivy's Logger so they share its handlers and
+# output format. Levels can be set on the command line, e.g.
+#
+#     --log-levels=debug                  (every subsystem)
+#     --log-levels=input:debug,menu:info  (individual subsystems)
+#
+# Subsystems without an explicit level inherit Kivy's log level, so debug output is off
+# by default. Hot paths check a module level flag obtained from is_debug() at import time,
+# which makes disabled debug logging free of any call or formatting overhead.
+
+from kivy.logger import Logger
+
+from helpers import get_cli_option
+
+import logging
+
+SUBSYSTEMS = ('app', 'input', 'cec', 'menu', 'game', 'trivia', 'sound')
+
+
+def parse_levels(spec):
+    """Parses a "subsystem:level,..." specification. A bare level applies to all subsystems."""
+    levels = {}
+    for item in filter(None, spec.split(',')):
+        subsystem, _, level = item.rpartition(':')
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            Logger.warning("Logs: Ignoring unknown log level in {}".format(item))
+            continue
+        if subsystem and subsystem not in SUBSYSTEMS:
+            Logger.warning("Logs: Unknown subsystem in {}, expected one of {}".format(item, ', '.join(SUBSYSTEMS)))
+            continue
+        levels[subsystem or 'all'] = level
+    return levels
+
+
+LEVELS = parse_levels(get_cli_option('--log-levels', ''))
+
+
+def get_logger(subsystem):
+    """Returns the logger for the given subsystem, with its level set as requested on the command line."""
+    log = Logger.getChild(subsystem)
+    level = LEVELS.get(subsystem, LEVELS.get('all'))
+    if level is not None:
+        log.setLevel(level)
+    return log
+
+
+def is_debug(log):
+    """Whether debug messages of the given logger will be emitted."""
+    return log.isEnabledFor(logging.DEBUG)
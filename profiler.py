@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.animation import Animation
+from kivy.uix.label import Label
+
+from collections import deque
+from time import time
+
+from logs import get_logger
+
+import csv
+
+log = get_logger('app')
+
+
+def percentile(sorted_values, fraction):
+    """Returns the given percentile (0. - 1.) of an already sorted list, using the nearest rank."""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class FrameProfiler:
+    """
+    Records the duration of every frame, together with the current screen, the number of
+    scheduled Clock events and the number of running Animations in the whole app (Kivy
+    does not tell which widgets, and thus screens, they belong to). Frame time percentiles
+    over the last frames can be shown in an on-screen overlay, and all samples can be
+    exported to a CSV file, for instance to find the screen transitions that drop frames.
+    """
+
+    CSV_HEADER = ('time', 'screen', 'frame_ms', 'clock_events', 'animations_all_screens')
+
+    def __init__(self, app, window_size=300, max_samples=200000):
+        """
+        :param app: The running app, used to find the current screen.
+        :param window_size: Number of most recent frames the overlay statistics are computed over.
+        :param max_samples: Maximum number of samples kept for the CSV export, the oldest are dropped.
+        """
+        self.app = app
+        self.samples = deque(maxlen=max_samples)
+        self.recent = deque(maxlen=window_size)
+        self.overlay = None
+        self.overlay_event = None
+        self.tick_event = Clock.schedule_interval(self.tick, 0)
+
+    def tick(self, dt):
+        """Called once per frame."""
+        screen = self.app.sm.current if self.app.sm else ''
+        frame_ms = dt * 1000
+        self.recent.append(frame_ms)
+        self.samples.append((time(), screen, frame_ms, len(Clock.get_events()), self.count_animations()))
+
+    @staticmethod
+    def count_animations():
+        """
+        Returns the number of running Animations. Kivy only keeps them in the private
+        Animation._instances, if that goes away the count is reported as -1.
+        """
+        instances = getattr(Animation, '_instances', None)
+        return len(instances) if instances is not None else -1
+
+    def get_stats(self):
+        """Returns p50, p95 and p99 of the recent frame times in milliseconds."""
+        recent = sorted(self.recent)
+        return percentile(recent, 0.5), percentile(recent, 0.95), percentile(recent, 0.99)
+
+    def toggle_overlay(self):
+        if self.overlay:
+            self.overlay_event.cancel()
+            Window.remove_widget(self.overlay)
+            self.overlay = None
+        else:
+            self.overlay = Label(size_hint=(None, None), size=(700, 160), halign='left', valign='top',
+                                 font_size=28, color=(1, 1, 1, 1), outline_width=2, outline_color=(0, 0, 0))
+            self.overlay.text_size = self.overlay.size
+            self.overlay.pos = (20, Window.height - self.overlay.height - 20)
+            Window.add_widget(self.overlay)
+            self.overlay_event = Clock.schedule_interval(self.update_overlay, 0.5)
+            self.update_overlay()
+
+    def update_overlay(self, dt=None):
+        p50, p95, p99 = self.get_stats()
+        latest = self.samples[-1] if self.samples else (0, '', 0, 0, 0)
+        self.overlay.pos = (20, Window.height - self.overlay.height - 20)
+        self.overlay.text = ("{:.0f} fps  [{}]\n"
+                             "frame p50 {:.1f} ms  p95 {:.1f} ms  p99 {:.1f} ms\n"
+                             "clock events {}  animations (all screens) {}").format(Clock.get_fps(), latest[1], p50, p95, p99,
+                                                                      latest[3], latest[4])
+
+    def export_csv(self, path):
+        try:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.CSV_HEADER)
+                writer.writerows(self.samples)
+        except OSError as exc:
+            log.error("FrameProfiler: Could not write %s: %s", path, exc)
+            return
+        log.info("FrameProfiler: Wrote %s frame samples to %s", len(self.samples), path)
+
+    def stop(self):
+        self.tick_event.cancel()
+        if self.overlay:
+            self.toggle_overlay()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from random import Random
+
+import random
+
+
+def permute_answers(correct_answer, incorrect_answers, rng):
+    """Returns all answers in an order given by rng, without modifying the given answers."""
+    answers = list(incorrect_answers)
+    answers.append(correct_answer)
+    rng.shuffle(answers)
+    return tuple(answers)
+
+
+class Question:
+    """
+    A single trivia question. The answers are shuffled once when the question is created,
+    using the given random number generator, so displaying it does not need to touch
+    the question's data anymore.
+    """
+
+    __slots__ = ('question', 'correct_answer', 'incorrect_answers', 'category', 'difficulty', 'type', 'author',
+                 'answers')
+
+    def __init__(self, question, correct_answer, incorrect_answers, category='', difficulty='', q_type='', author='',
+                 rng=random):
+        self.question = question
+        self.correct_answer = correct_answer
+        self.incorrect_answers = tuple(incorrect_answers)
+        self.category = category
+        self.difficulty = difficulty
+        self.type = q_type
+        self.author = author
+        self.answers = permute_answers(correct_answer, self.incorrect_answers, rng)
+
+    @classmethod
+    def from_dict(cls, data, rng=random):
+        """Creates a question from its representation in the backends' responses."""
+        return cls(data['question'], data['correct_answer'], data['incorrect_answers'], data.get('category', ''),
+                   data.get('difficulty', ''), data.get('type', ''), data.get('author') or '', rng)
+
+    def to_dict(self):
+        """Returns the question in the format of the backends' responses."""
+        data = {
+            'question': self.question,
+            'correct_answer': self.correct_answer,
+            'incorrect_answers': list(self.incorrect_answers),
+            'category': self.category,
+            'difficulty': self.difficulty,
+            'type': self.type,
+        }
+        if self.author:
+            data['author'] = self.author
+        return data
+
+    def __repr__(self):
+        return "<Question {!r}>".format(self.question)
+
+
+class QuestionSet:
+    """
+    The questions of one game. If a seed is given, the answer orders of the questions
+    are shuffled deterministically, so the same seed always gives the same permutations.
+    """
+
+    __slots__ = ('questions', 'seed')
+
+    def __init__(self, questions, seed=None):
+        """
+        If a seed is given, the answers of the questions are permuted anew from it. The
+        permutations are derived from the questions' original answers only.
+        """
+        self.questions = tuple(questions)
+        self.seed = seed
+        if seed is not None:
+            rng = Random(seed)
+            for question in self.questions:
+                question.answers = permute_answers(question.correct_answer, question.incorrect_answers, rng)
+
+    @classmethod
+    def from_dicts(cls, data, seed=None):
+        rng = Random(seed)
+        questions = cls([Question.from_dict(item, rng) for item in data])
+        questions.seed = seed
+        return questions
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __getitem__(self, index):
+        return self.questions[index]
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def __repr__(self):
+        return "<QuestionSet {!r}>".format(self.questions)
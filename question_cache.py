@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from logs import get_logger
+from question import Question
+
+from collections import deque
+from hashlib import sha1
+from threading import Event, Thread
+from time import time
+
+import json
+import sqlite3
+
+
+log = get_logger('trivia')
+
+# Category ids meaning "all categories" for the supported backends
+ALL_CATEGORIES = (0, -1)
+
+
+def category_key(name):
+    """Normalizes a category name, so that e.g. "Entertainment: Books" matches "Books"."""
+    return name.rpartition(':')[2].strip().lower()
+
+
+class QuestionCache:
+    """
+    Persistent on-disk store of every question fetched from a trivia backend.
+    Questions are keyed by backend and a hash of their content, so fetching the same
+    question twice only refreshes its timestamp. Games can be drawn from the store
+    when the network is slow or unavailable.
+
+    Every question is stored with the id of its category, so that questions fetched for
+    "All" categories can also be served when a specific category is chosen later on. The
+    backends only return category names, which are resolved against the known category
+    lists, and against the names seen in responses for a specific category.
+
+    Storing and evicting questions is done by a background thread with a connection of
+    its own, so that no disk writes happen on the UI thread. Drawing questions reads
+    from the UI thread's connection, which the write-ahead log keeps from waiting for
+    the writes.
+    """
+
+    def __init__(self, path='question_cache.db', ttl=7*24*3600, max_size=5000, categories=None):
+        """
+        :param path: Location of the SQLite database file.
+        :param ttl: Seconds after which a cached question is considered stale and no longer served.
+        :param max_size: Maximum number of questions kept on disk, the oldest are evicted first.
+        :param categories: Dict of backend -> list of [name, id] of its categories.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        # backend -> normalized category name -> category id
+        self.category_ids = {}
+        for backend, pairs in (categories or {}).items():
+            self.category_ids[backend] = {category_key(name): cat_id for name, cat_id in pairs
+                                          if cat_id not in ALL_CATEGORIES}
+        self.path = path
+        self.db = sqlite3.connect(path)
+        try:
+            self.db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as exc:
+            log.warning("QuestionCache: Could not enable the write-ahead log: %s", exc)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS questions (
+                backend TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                category_id INTEGER NOT NULL,
+                difficulty TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (backend, hash)
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS questions_fetched_at ON questions (fetched_at)")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS category_names (
+                backend TEXT NOT NULL,
+                name TEXT NOT NULL,
+                category_id INTEGER NOT NULL,
+                PRIMARY KEY (backend, name)
+            )""")
+        self.db.commit()
+        for backend, name, cat_id in self.db.execute("SELECT backend, name, category_id FROM category_names"):
+            self.category_ids.setdefault(backend, {})[name] = cat_id
+        # Only used on the writer thread from here on, like category_ids
+        self.writer = None
+        self.jobs = deque()
+        self.wake = Event()
+        self.stopped = False
+        self.thread = Thread(target=self.run, name='question-cache', daemon=True)
+        self.thread.start()
+        self.request(self.evict)
+
+    def request(self, func, *args):
+        """Runs func(*args) on the writer thread."""
+        self.jobs.append((func, args))
+        self.wake.set()
+
+    def run(self):
+        self.writer = sqlite3.connect(self.path)
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            while self.jobs:
+                func, args = self.jobs.popleft()
+                func(*args)
+            if self.stopped:
+                break
+        self.writer.close()
+
+    @staticmethod
+    def get_hash(question):
+        """Returns a stable hash identifying a question independently of its answer order."""
+        content = question.question + "\x00" + question.correct_answer
+        return sha1(content.encode('utf-8')).hexdigest()
+
+    def learn_categories(self, backend, category, questions):
+        """Records the category names of questions fetched for a specific category. Returns the new ones."""
+        names = self.category_ids.setdefault(backend, {})
+        learned = []
+        for name in {category_key(q.category) for q in questions if q.category}:
+            if names.get(name) != category:
+                names[name] = category
+                learned.append((backend, name, category))
+        return learned
+
+    def resolve_category(self, backend, category, question):
+        """Returns the category id of a question fetched for the given (requested) category id."""
+        if category not in ALL_CATEGORIES:
+            return category
+        return self.category_ids.get(backend, {}).get(category_key(question.category), category)
+
+    def store(self, backend, category, questions):
+        """
+        Records Questions fetched from a backend for the given category id, in the background.
+        Questions fetched for all categories are stored with their own category's id, if it
+        can be resolved.
+        """
+        self.request(self.store_now, backend, category, questions)
+
+    def store_now(self, backend, category, questions):
+        now = time()
+        learned = self.learn_categories(backend, category, questions) if category not in ALL_CATEGORIES else []
+        rows = [(backend, self.get_hash(q), self.resolve_category(backend, category, q), q.difficulty, q.type,
+                 json.dumps(q.to_dict()), now)
+                for q in questions]
+        try:
+            with self.writer:
+                self.writer.executemany("INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self.writer.executemany("INSERT OR REPLACE INTO category_names VALUES (?, ?, ?)", learned)
+        except sqlite3.Error as exc:
+            log.warning("QuestionCache: Could not store questions: %s", exc)
+            return
+        self.evict()
+
+    def draw(self, backend, difficulty, category, amount, q_type):
+        """
+        Returns up to amount random, non-stale Questions matching the given game settings.
+        An empty list is returned if none are available.
+        """
+        query = "SELECT data FROM questions WHERE backend = ? AND fetched_at >= ?"
+        params = [backend, time() - self.ttl]
+        if category not in ALL_CATEGORIES:
+            query += " AND category_id = ?"
+            params.append(category)
+        if difficulty != '':
+            query += " AND difficulty = ?"
+            params.append(difficulty)
+        if q_type != '':
+            query += " AND type = ?"
+            params.append(q_type)
+        query += " ORDER BY RANDOM() LIMIT ?"
+        params.append(amount)
+        try:
+            return [Question.from_dict(json.loads(row[0])) for row in self.db.execute(query, params)]
+        except sqlite3.Error as exc:
+            log.warning("QuestionCache: Could not draw questions: %s", exc)
+            return []
+
+    def evict(self):
+        """Removes stale questions and, if the store is still too big, the oldest ones. Writer thread only."""
+        try:
+            with self.writer:
+                self.writer.execute("DELETE FROM questions WHERE fetched_at < ?", (time() - self.ttl,))
+                self.writer.execute("""
+                    DELETE FROM questions WHERE rowid IN (
+                        SELECT rowid FROM questions ORDER BY fetched_at DESC LIMIT -1 OFFSET ?
+                    )""", (self.max_size,))
+        except sqlite3.Error as exc:
+            log.warning("QuestionCache: Could not evict questions: %s", exc)
+
+    def close(self):
+        """Finishes the pending writes and closes the database."""
+        self.stopped = True
+        self.wake.set()
+        self.thread.join()
+        self.db.close()
@@ -4,20 +4,70 @@
 from kivy.app import App
 from kivy.clock import Clock
 from kivy.animation import Animation
-from kivy.uix.screenmanager import Screen
+from kivy.uix.screenmanager import Screen, ScreenManager
 from kivy.properties import ListProperty, StringProperty
 
-from random import shuffle, choice
+from random import choice
 from functools import partial
 
 from helpers import get_verdict
 from simple_widgets import MainTitle
+from text_cache import label_textures
 from constants import CEC_CMD_MAP, NEGATIVES, POSITIVES
+from logs import get_logger
+from timeline import Timeline
 
 import sys
 
 DELAY_START = True if '--delay-start' in sys.argv else False
 
+log = get_logger('game')
+
+
+class LazyScreenManager(ScreenManager):
+    """
+    ScreenManager which constructs registered screens only when they are first needed,
+    i.e. when they become the current screen or are looked up by name. Screens that have
+    not been needed yet can be built in the background using build_pending.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.factories = {}
+        self.build_event = None
+
+    def register(self, name, factory):
+        """Registers a screen to be constructed later by calling factory(name=name)."""
+        self.factories[name] = factory
+
+    def ensure_screen(self, name):
+        """Constructs the given screen if it has been registered, but not yet built."""
+        factory = self.factories.pop(name, None)
+        if factory:
+            self.add_widget(factory(name=name))
+
+    def get_screen(self, name):
+        self.ensure_screen(name)
+        return super().get_screen(name)
+
+    def has_screen(self, name):
+        return name in self.factories or super().has_screen(name)
+
+    def on_current(self, instance, value):
+        self.ensure_screen(value)
+        super().on_current(instance, value)
+
+    def build_pending(self):
+        """Builds the screens that have not been needed yet, one per frame."""
+        if not self.build_event and self.factories:
+            self.build_event = Clock.schedule_interval(self.build_next, 0)
+
+    def build_next(self, dt=None):
+        if not self.factories:
+            self.build_event = None
+            return False
+        self.ensure_screen(next(iter(self.factories)))
+
 
 class TitleScreen(Screen):
     
@@ -26,6 +76,7 @@ class TitleScreen(Screen):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.timeline = Timeline()
             
     def on_pre_enter(self):
         self.reset_widgets()
@@ -39,6 +90,9 @@ class TitleScreen(Screen):
         anim = Animation(scale=1, opacity=1, t='out_elastic', duration=1)
         anim.bind(on_complete=partial(self.start_secondary_anims, direction='in'))
         anim.start(self.ids.main_title)
+
+    def on_leave(self, *args):
+        self.timeline.cancel()
         
     def start_secondary_anims(self, anim, widget, direction):
         """
@@ -49,14 +103,10 @@ class TitleScreen(Screen):
             fade_func = self.fade_in_widget
         else:
             fade_func = self.fade_out_widget
-        delay = 0
-        for child in reversed(self.children):
-            if (type(child) is MainTitle and direction == 'in') or not child.auto_anim:
-                # This is the MainTitle, which is already visible and should be skipped here.
-                continue
-            Clock.schedule_once(partial(fade_func, child), delay)
-            delay += 0.1
-        return delay
+        # The MainTitle is already visible when fading in and is skipped then
+        children = [child for child in reversed(self.children)
+                    if child.auto_anim and not (type(child) is MainTitle and direction == 'in')]
+        return self.timeline.stagger(0, 0.1, fade_func, children)
             
     def fade_in_widget(self, widget, dt=None):
         """Fades in the given widget."""
@@ -79,7 +129,7 @@ class TitleScreen(Screen):
         The latter is a method which should result in a screen switch.
         """
         next_delay = self.start_secondary_anims(None, None, direction='out')
-        Clock.schedule_once(func, next_delay+0.1)
+        self.timeline.at(next_delay+0.1, func)
 
 class Intro(Screen):
 
@@ -89,6 +139,7 @@ class Intro(Screen):
         super().__init__(**kwargs)
         self.outline_anim = None
         self.press_ok_anim2 = None
+        App.get_running_app().idle_manager.bind(idle=self.on_app_idle)
         App.get_running_app().add_callback(CEC_CMD_MAP["OK"], "intro", partial(self.goto_screen, "game"))
         App.get_running_app().add_callback(CEC_CMD_MAP["RED"], "intro", partial(self.goto_screen, "options"))
 
@@ -111,7 +162,7 @@ class Intro(Screen):
         return super(Intro, self).on_touch_down(touch)
 
     def opening_animations(self):
-        App.get_running_app().bg_anim.start(App.get_running_app())
+        App.get_running_app().idle_manager.start_animation(App.get_running_app().bg_anim, App.get_running_app())
         anim = Animation(scale=1, opacity=1, t='out_elastic', duration=2)
         anim.bind(on_complete=self.start_secondary_anims)
         anim.start(self.ids.feduquiz_title)
@@ -128,15 +179,26 @@ class Intro(Screen):
         self.press_ok_anim2.repeat = True
 
         press_ok_anim1 = Animation(pos_hint={'center_x': 0.5, 'center_y': 0.35}, opacity=1, t='out_circ', duration=1)
-        press_ok_anim1.bind(on_complete=lambda anim,widget: self.press_ok_anim2.start(self.ids.press_ok))
+        press_ok_anim1.bind(on_complete=lambda anim,widget: App.get_running_app().idle_manager.start_animation(
+            self.press_ok_anim2, self.ids.press_ok))
         press_ok_anim1.start(self.ids.press_ok)
 
         move_title_anim = Animation(pos_hint={'center_x': 0.5, 'center_y': 0.6}, t='out_circ', duration=1)
-        move_title_anim.bind(on_complete=lambda anim, widget: self.outline_anim.start(self))
+        move_title_anim.bind(on_complete=self.intro_done)
         move_title_anim.start(self.ids.feduquiz_title)
 
+    def intro_done(self, anim=None, widget=None):
+        App.get_running_app().idle_manager.start_animation(self.outline_anim, self)
+        # The opening animation is over, use the following idle frames to build the other screens
+        self.manager.build_pending()
+
+    def on_app_idle(self, manager, idle):
+        if idle:
+            manager.pause_animation(self.outline_anim, self)
+            manager.pause_animation(self.press_ok_anim2, self.ids.press_ok)
+
     def goto_screen(self, screen):
-        self.outline_anim.cancel(self.ids.feduquiz_title)
+        self.outline_anim.cancel(self)
         self.press_ok_anim2.cancel(self.ids.press_ok)
         anim1 = Animation(opacity=0)
         anim2 = Animation(opacity=0)
@@ -192,6 +254,23 @@ class Game(Screen):
         self.buttons_active = False
         self.last_button_color = None
 
+        # The next question's presentation, prepared while the answer feedback plays
+        self.next_presentation = None
+
+        # Question and info animations, built on first use and restarted for every question
+        self.anims = {}
+
+        # Everything lined up while a game is played, cancelled when the screen is left
+        self.timeline = Timeline()
+
+        # Screens are only laid out once shown, until then the widgets have their default
+        # size and label textures prewarmed for them would never be used. The question to
+        # prewarm is kept until the game buttons get their actual size.
+        self.laid_out = False
+        self.pending_prewarm = None
+        self.prewarm_trigger = Clock.create_trigger(self.prewarm_pending)
+        self.ids.game_buttons.bind(size=self.on_first_layout)
+
     def on_enter(self, *args):
         self.load_current_question()
         self.gi_anim("in")
@@ -199,26 +278,42 @@ class Game(Screen):
         self.ids.game_buttons.anim_all("in")
         self.buttons_active = True
 
+    def on_leave(self, *args):
+        self.timeline.cancel()
+        self.ids.game_buttons.stop_effect_anims()
+
     def load_current_question(self):
         if App.get_running_app().trivia.check_game():
-            current_question = App.get_running_app().trivia.get_current_question()
-            App.get_running_app().curr_question = current_question["question"]
-            App.get_running_app().curr_author = current_question["author"] if "author" in current_question else ''
-            App.get_running_app().curr_type = current_question["type"]
-            App.get_running_app().curr_difficulty = current_question["difficulty"]
-            App.get_running_app().curr_category = current_question["category"]
-            App.get_running_app().curr_correct = current_question["correct_answer"]
-            App.get_running_app().curr_wrong = current_question["incorrect_answers"]
-            App.get_running_app().curr_round = App.get_running_app().trivia.get_current_round()
-            App.get_running_app().curr_total_rounds = App.get_running_app().trivia.get_total_rounds()
-            self.shuffle_btn_labels(App.get_running_app().curr_correct, App.get_running_app().curr_wrong)
-
-    def shuffle_btn_labels(self, correct, base):
-        base.append(correct)
-        shuffle(base)
-        App.get_running_app().curr_btn_labels.clear()
-        for answer in base:
-            App.get_running_app().curr_btn_labels.append(answer)
+            self.show_question(self.prepare_question())
+
+    def prepare_question(self):
+        """
+        Gathers everything needed to display the current question of the game: the values
+        of the app's curr_* properties, including the shuffled answers for the buttons.
+        The label textures are rendered in the background.
+        """
+        trivia = App.get_running_app().trivia
+        current_question = trivia.get_current_question()
+        presentation = {
+            'curr_question': current_question.question,
+            'curr_author': current_question.author,
+            'curr_type': current_question.type,
+            'curr_difficulty': current_question.difficulty,
+            'curr_category': current_question.category,
+            'curr_correct': current_question.correct_answer,
+            'curr_wrong': list(current_question.incorrect_answers),
+            'curr_round': trivia.get_current_round(),
+            'curr_total_rounds': trivia.get_total_rounds(),
+            'curr_btn_labels': list(current_question.answers),
+        }
+        self.prewarm_question(current_question)
+        return presentation
+
+    def show_question(self, presentation):
+        """Swaps in a prepared question, setting each of the app's properties exactly once."""
+        app = App.get_running_app()
+        for name, value in presentation.items():
+            setattr(app, name, value)
 
 
     def button_press(self, color):
@@ -226,7 +321,7 @@ class Game(Screen):
             self.ids.game_buttons.ids.game_btn_layout.remove_widget(self.ids.game_buttons.ids['btn_'+color])
             self.ids.game_buttons.ids.game_btn_layout.add_widget(self.ids.game_buttons.ids['btn_'+color])
             self.btn_pressed_anim.start(self.ids.game_buttons.ids['btn_'+color])
-            print("BUTTON PRESS: " + color)
+            log.debug("Game: Button press %s", color)
             self.answer = self.ids.game_buttons.ids['btn_'+color].text
             self.last_button_color = color
             self.start_answer_sequence()
@@ -237,20 +332,54 @@ class Game(Screen):
         self.ids.game_buttons.anim_all("out", highlight=self.last_button_color, callback=self.end_answer_sequence)
 
         if self.answer == App.get_running_app().curr_correct:
-            print("CORRECT ANSWER")
+            log.debug("Game: Correct answer")
             feedback_msg = choice(POSITIVES)
             feedback_lbl = self.ids.positive_label
             App.get_running_app().trivia.register_answer(True)
         else:
-            print("WRONG ANSWER")
+            log.debug("Game: Wrong answer")
             feedback_msg = choice(NEGATIVES)
             feedback_lbl = self.ids.negative_label
             App.get_running_app().trivia.register_answer(False)
 
+        # Prepare the next question while the current one is animated out
+        self.next_presentation = self.prepare_question() if App.get_running_app().trivia.check_game() else None
+
         # Animate answer feedback
         feedback_lbl.text = feedback_msg
         if App.get_running_app().opt_instant_fb:
-            Clock.schedule_once(lambda dt: feedback_lbl.animate(), 0.3)
+            feedback_lbl.animate(delay=0.3)
+
+    def on_first_layout(self, widget, size):
+        self.laid_out = True
+        widget.unbind(size=self.on_first_layout)
+        # Wait for the rest of the layout pass, which happens within the same frame
+        self.prewarm_trigger()
+
+    def prewarm_pending(self, dt=None):
+        question, self.pending_prewarm = self.pending_prewarm, None
+        if question is not None:
+            self.prewarm_question(question)
+
+    def prewarm_question(self, question):
+        """
+        Renders the label textures needed to display the given question ahead of time, or,
+        before the screen has been laid out, once it has.
+        """
+        if not self.laid_out:
+            self.pending_prewarm = question
+            return
+        label_textures.prewarm(self.ids.question_label, [question.question])
+        # The buttons are resized when switching between multiple choice and true/false
+        # questions, render the answers for the size they will have
+        game_buttons = self.ids.game_buttons
+        size_hint = game_buttons.get_btn_size_hint(len(question.answers))
+        for color, answer in zip(['red', 'green', 'yellow', 'blue'], question.answers):
+            button = game_buttons.ids['btn_' + color]
+            text_size = button.get_text_size(game_buttons.width * size_hint[0], game_buttons.height * size_hint[1])
+            label_textures.prewarm(button, [answer], text_size=text_size)
+        category_label = self.ids.info_widget.ids.category_widget.ids.cat2.ids.scrollable_label
+        label_textures.prewarm(category_label, [question.category])
 
     def end_answer_sequence(self):
         # Reset positions of question label and input buttons
@@ -260,8 +389,9 @@ class Game(Screen):
         App.get_running_app().curr_score = App.get_running_app().trivia.score
 
         if App.get_running_app().trivia.check_game():
-            # Game is still running - next question
-            self.load_current_question()
+            # Game is still running - swap in the next question
+            self.show_question(self.next_presentation)
+            self.next_presentation = None
 
             # Bring back question label and input buttons
             self.q_anim("in")
@@ -271,12 +401,20 @@ class Game(Screen):
             # Game has ended - move to highscores
             App.get_running_app().curr_verdict = get_verdict(App.get_running_app().curr_score / App.get_running_app().curr_total_rounds)
             self.gi_anim("out")
-            Clock.schedule_once(self.goto_score, 1)
+            self.timeline.at(1, self.goto_score)
 
     def goto_score(self, dt=None):
         self.manager.current = 'score'
 
     def q_anim(self, direction):
+        anim = self.anims.get(('question', direction))
+        if anim is None:
+            anim = self.anims[('question', direction)] = self.build_q_anim(direction)
+        if direction == "in":
+            self.ids.question_label.anim_mask_open()
+        anim.start(self.ids.question_label)
+
+    def build_q_anim(self, direction):
         if direction == "in":
             anim = Animation(
                 pos_hint={'center_x': self.ids.question_label.primary_position[0],
@@ -284,7 +422,6 @@ class Game(Screen):
                 opacity=1,
                 t='out_quad',
                 duration=0.5)
-            self.ids.question_label.anim_mask_open()
         else:
             anim = Animation(
                 pos_hint={'center_x': self.ids.question_label.secondary_position_2[0],
@@ -293,7 +430,7 @@ class Game(Screen):
                 t='in_quad',
                 duration=0.5)
             anim.bind(on_complete=self.ids.question_label.reset_pos)
-        anim.start(self.ids.question_label)
+        return anim
 
     def q_reset_pos(self):
         self.ids.question_label.pos_hint = {
@@ -302,6 +439,12 @@ class Game(Screen):
         }
 
     def gi_anim(self, direction):
+        anim = self.anims.get(('info', direction))
+        if anim is None:
+            anim = self.anims[('info', direction)] = self.build_gi_anim(direction)
+        anim.start(self.ids.info_widget)
+
+    def build_gi_anim(self, direction):
         if direction == "in":
             anim = Animation(
                 pos_hint={'center_x': self.ids.info_widget.primary_position[0],
@@ -316,7 +459,7 @@ class Game(Screen):
                 opacity=0,
                 t='in_back',
                 duration=0.5)
-        anim.start(self.ids.info_widget)
+        return anim
 
 class Score(TitleScreen):
 
@@ -325,6 +468,7 @@ class Score(TitleScreen):
         self.press_ok_anim2 = None
         self.out_anim_1 = None
         self.out_anim_2 = None
+        App.get_running_app().idle_manager.bind(idle=self.on_app_idle)
         App.get_running_app().add_callback(CEC_CMD_MAP["OK"], "score", partial(self.goto_func, App.get_running_app().load_game))
         App.get_running_app().add_callback(CEC_CMD_MAP["RED"], "score", partial(self.goto_func, partial(App.get_running_app().goto_screen, s_name='options')))
 
@@ -337,12 +481,17 @@ class Score(TitleScreen):
             # reset_widgets.
             self.press_ok_anim2 = Animation(opacity=1) + Animation(opacity=0.5)
             self.press_ok_anim2.repeat = True
-            Clock.schedule_once(lambda dt: self.press_ok_anim2.start(self.ids.press_ok), 0.2)
+            self.timeline.at(0.2, App.get_running_app().idle_manager.start_animation, self.press_ok_anim2,
+                             self.ids.press_ok)
         else:
             self.ids.press_ok.auto_anim = True
             self.press_ok_anim2.cancel(self.ids.press_ok)
         return super().start_secondary_anims(anim, widget, direction)
 
+    def on_app_idle(self, manager, idle):
+        if idle:
+            manager.pause_animation(self.press_ok_anim2, self.ids.press_ok)
+
     def reset_widgets(self):
         # See explanation above
         super().reset_widgets()
@@ -14,6 +14,11 @@ from kivy.properties import ListProperty, BooleanProperty, NumericProperty, Obje
 
 from random import randint
 
+from logs import get_logger, is_debug
+
+log = get_logger('menu')
+MENU_DEBUG = is_debug(log)
+
 
 class ScrollMenu(BoxLayout):
     menu_width = NumericProperty()
@@ -90,10 +95,12 @@ class FreeScrollView(ScrollView):
         ScrollAwareLayout. After this, every widget addition is forwarded to the ScrollAwareLayout.
         """
         if len(self.children) == 0:
-            print("Adding widget to FreeScrollView. Widget {}".format(widget))
+            if MENU_DEBUG:
+                log.debug("FreeScrollView: Adding widget %s", widget)
             super().add_widget(widget)
         else:
-            print("Forwarding widget addition to ScrollAwareLayout. Widget {}".format(widget))
+            if MENU_DEBUG:
+                log.debug("FreeScrollView: Forwarding widget addition to ScrollAwareLayout. Widget %s", widget)
             self.ids.saware_layout.add_widget(widget)
 
     def get_relative_center_y(self, widget):
@@ -111,7 +118,8 @@ class FreeScrollView(ScrollView):
         # Divide the current "height" of the widget in the ScrollView by the ScrollView's
         # height to find its relative position and call animation method of parent.
         rel_pos = widget_pos_in_parent / self.height
-        print("Relative center_y: {}".format(rel_pos))
+        if MENU_DEBUG:
+            log.debug("FreeScrollView: Relative center_y %s", rel_pos)
         return rel_pos
 
     def set_indicator_y(self, dt=None):
@@ -126,17 +134,18 @@ class FreeScrollView(ScrollView):
         self.indicator_anim.start(self)
 
     def on_current_focus(self, parent, widget):
-        print("Current focus changed! {}".format(widget))
+        if MENU_DEBUG:
+            log.debug("FreeScrollView: Current focus changed to %s", widget)
         Clock.schedule_once(self.check_for_indicator_animation)
 
     def check_for_indicator_animation(self, dt=None):
         percentage = self.percentage_visible(self.current_focus)
         if percentage < 1:
-            print("WAITING {}".format(percentage))
+            if MENU_DEBUG:
+                log.debug("FreeScrollView: Waiting for focussed widget, %s visible", percentage)
             self.wait_for_widget = True
             self.scroll_to(self.current_focus, padding=10, animate={'duration': 0.1})
         else:
-            print("NOT waiting")
             Clock.schedule_once(self.set_indicator_y)
 
 
@@ -146,7 +155,8 @@ class ScrollAwareLayout(BoxLayout):
 
     def on_height(self, *args):
         self.height_per_child = (self.height / len(self.children)) if len(self.children) > 0 else 0
-        print("Height per child: {}".format(self.height_per_child))
+        if MENU_DEBUG:
+            log.debug("ScrollAwareLayout: Height per child %s", self.height_per_child)
         self.do_bound_check()
 
     def add_widget(self, widget):
@@ -189,9 +199,9 @@ class OptionButton(ButtonBehavior, FocusBehavior, Label):
     def on_focus(self, widget=None, focus=None):
         self.focus_anim.cancel(self)
         if self.focus:
-            print("Focus!")
-            print("Current value: {}".format(
-                getattr(App.get_running_app(), self.action_target) if self.action_target else 'N/A'))
+            if MENU_DEBUG:
+                log.debug("OptionButton: Focus on %s, current value %s", self.text,
+                          getattr(App.get_running_app(), self.action_target) if self.action_target else 'N/A')
             self.set_rand_outline()
             self.focus_anim = Animation(scale=1.15, duration=0.3, t='out_elastic')
             self.focus_anim.start(self)
@@ -256,9 +266,11 @@ class OptionIndicator(Widget):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.anim = None
+        App.get_running_app().idle_manager.bind(idle=self.on_app_idle)
 
-    def on_y(self, *args):
-        print("ON Y: {}, args: {}".format(self.y, args))
+    def on_app_idle(self, manager, idle):
+        if idle:
+            manager.pause_animation(self.anim, self)
 
     def on_x_transform_max(self, widget, transform_value):
         Animation.cancel_all(self)
@@ -266,4 +278,4 @@ class OptionIndicator(Widget):
                                                                                                         t='out_cubic',
                                                                                                         duration=0.5)
         self.anim.repeat = True
-        self.anim.start(self)
\ No newline at end of file
+        App.get_running_app().idle_manager.start_animation(self.anim, self)
\ No newline at end of file
@@ -8,10 +8,15 @@ from kivy.properties import StringProperty, ListProperty, NumericProperty
 from kivy.graphics.opengl import *
 from kivy.graphics import *
 
+from text_cache import CachedTextMixin
+
 class MainTitle(Label):
 
     scale = NumericProperty(1)
 
+class CachedLabel(CachedTextMixin, Label):
+    pass
+
 class AlphaWidget(EffectWidget):
 
     def __init__(self, **kwargs):
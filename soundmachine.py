@@ -1,49 +1,121 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from kivy.logger import Logger
 from kivy.clock import Clock
 from kivy.core.audio import SoundLoader
 
+from functools import partial
+
+from logs import get_logger
+
+log = get_logger('sound')
+
+MUSIC_FILES = {
+    'game': 'resources/fast_level.wav',
+    'menu': 'resources/elevator.ogg',
+}
+
+
+class VoicePool:
+    """
+    A fixed number of preloaded copies (voices) of one sound effect, played round-robin.
+    Rapid triggers overlap instead of cutting each other off, and once all voices are busy
+    the oldest one is restarted, which caps the polyphony.
+    """
+
+    def __init__(self, filename, voices=3):
+        self.voices = [sound for sound in (SoundLoader.load(filename) for _ in range(voices)) if sound]
+        self.next_voice = 0
+        if not self.voices:
+            log.warning("SoundMachine: Could not load sound effect %s", filename)
+
+    def play(self):
+        voices = self.voices
+        if not voices:
+            return
+        index = self.next_voice
+        self.next_voice = (index + 1) % len(voices)
+        try:
+            voices[index].play()
+        except Exception as exc:
+            # Don't try this voice again
+            log.warning("SoundMachine: Could not play sound effect %s: %s", voices[index].source, exc)
+            del voices[index]
+            self.next_voice = 0
+
+
 class SoundMachine:
     """Holds and plays sounds."""
 
-    def __init__(self):
-        """Initialise SoundLoaders."""
-        self.snd_btn_sel = SoundLoader.load('resources/sfx_menu_select1.wav')
-        self.snd_btn_mov = SoundLoader.load('resources/sfx_menu_move4.wav')
-        self.snd_game = SoundLoader.load('resources/fast_level.wav')
-        self.snd_menu = SoundLoader.load('resources/elevator.ogg')
+    def __init__(self, music_unload_delay=30, sfx_voices=3):
+        """
+        Initialise voice pools for the short sound effects, with up to sfx_voices overlapping
+        plays each. Music is only loaded when it is first played, and unloaded
+        music_unload_delay seconds after it has been stopped.
+        """
+        self.snd_btn_sel = VoicePool('resources/sfx_menu_select1.wav', sfx_voices)
+        self.snd_btn_mov = VoicePool('resources/sfx_menu_move4.wav', sfx_voices)
+        self.music = {}
+        self.unload_events = {}
+        self.music_unload_delay = music_unload_delay
 
     def btn_sel(self):
         """Sound to play for an OptionButton selection."""
-        self.proxy(self.snd_btn_sel, "play")
+        self.snd_btn_sel.play()
 
     def btn_mov(self):
         """Sound to play for an OptionButton movement."""
-        self.proxy(self.snd_btn_mov, "play")
+        self.snd_btn_mov.play()
 
     def mode_menu(self):
         """Switch background music to menu mode."""
-        print("Playing menu theme")
-        if self.proxy(self.snd_game, "state") == "play":
-            self.proxy(self.snd_game, "stop")
-        self.proxy(self.snd_menu, "loop", True)
-        self.proxy(self.snd_menu, "play")
+        log.info("SoundMachine: Playing menu theme")
+        self.stop_music('game')
+        snd_menu = self.get_music('menu')
+        self.proxy(snd_menu, "loop", True)
+        self.proxy(snd_menu, "play")
 
     def mode_game(self):
         """Switch background music to game mode."""
-        print("Playing game theme")
-        if self.proxy(self.snd_menu, "state") == "play":
-            self.proxy(self.snd_menu, "stop")
-        self.proxy(self.snd_game, "loop", True)
-        Clock.schedule_once(lambda dt: self.proxy(self.snd_game, "play"), 0.25)
-    
+        log.info("SoundMachine: Playing game theme")
+        self.stop_music('menu')
+        snd_game = self.get_music('game')
+        self.proxy(snd_game, "loop", True)
+        Clock.schedule_once(lambda dt: self.proxy(snd_game, "play"), 0.25)
+
+    def get_music(self, name):
+        """Returns the given music track, loading it if necessary."""
+        event = self.unload_events.pop(name, None)
+        if event:
+            event.cancel()
+        if name not in self.music:
+            # Whether music is streamed from disk or decoded into memory at once depends on
+            # the audio provider, which can be chosen with the KIVY_AUDIO environment variable.
+            self.music[name] = SoundLoader.load(MUSIC_FILES[name])
+        return self.music[name]
+
+    def stop_music(self, name):
+        """Stops the given music track if it is loaded, and schedules it for unloading."""
+        sound = self.music.get(name)
+        if sound is None:
+            return
+        if self.proxy(sound, "state") == "play":
+            self.proxy(sound, "stop")
+        if name not in self.unload_events:
+            self.unload_events[name] = Clock.schedule_once(partial(self.unload_music, name), self.music_unload_delay)
+
+    def unload_music(self, name, dt=None):
+        self.unload_events.pop(name, None)
+        sound = self.music.pop(name, None)
+        if sound is not None:
+            log.debug("SoundMachine: Unloading %s theme", name)
+            self.proxy(sound, "unload")
+
     def proxy(self, sound, command, new_val=None):
         """
         Various factors can have an impact on the ability to play a given sound
         format on a given machine. This command acts as a proxy for sound objects
-        so that a warning can be printed to the console if something fails instead
+        so that a warning can be logged if something fails instead
         of raising an exception and quitting the game.
         """
         try:
@@ -56,4 +128,4 @@ class SoundMachine:
                 else:
                     return temp_proxy
         except Exception as exc:
-            Logger.exception("Could not proxy {} for sound {}{}. Exception: {}".format(command, sound, " with value {}".format(new_val) if new_val else "", exc))
+            log.exception("Could not proxy {} for sound {}{}. Exception: {}".format(command, sound, " with value {}".format(new_val) if new_val else "", exc))
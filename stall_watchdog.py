@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy.clock import Clock
+
+from logging.handlers import RotatingFileHandler
+from threading import Event, Thread, main_thread
+from time import monotonic
+
+from logs import get_logger
+
+import logging
+import sys
+import traceback
+
+log = get_logger('app')
+
+
+class StallWatchdog:
+    """
+    Notices when the main loop stalls, i.e. when the Clock has not ticked for more than
+    threshold seconds, and appends the main thread's current stack, tagged with the
+    current screen, to a rotating stall log. The Clock only ticks a heartbeat a few times
+    per threshold, and the watchdog thread sleeps in between, so it can stay enabled.
+    """
+
+    def __init__(self, app, threshold=2, path='stall.log', max_bytes=1024*1024, backups=3):
+        """
+        :param app: The running app, used to find the current screen.
+        :param threshold: Seconds without Clock tick after which the main loop counts as stalled.
+        :param path: The stall log, rotated once it reaches max_bytes, keeping backups old logs.
+        """
+        self.app = app
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.stall_log = logging.getLogger('feduquiz.stalls')
+        self.stall_log.propagate = False
+        self.stall_log.setLevel(logging.INFO)
+        if not self.stall_log.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.stall_log.addHandler(handler)
+        self.main_thread_id = main_thread().ident
+        self.last_beat = monotonic()
+        self.stall_start = None
+        self.stopped = Event()
+        self.beat_event = Clock.schedule_interval(self.beat, self.interval)
+        self.thread = Thread(target=self.run, name='watchdog', daemon=True)
+        self.thread.start()
+
+    def beat(self, dt=None):
+        self.last_beat = monotonic()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            since_beat = monotonic() - self.last_beat
+            if since_beat > self.threshold:
+                if self.stall_start is None:
+                    self.stall_start = self.last_beat
+                    self.report(since_beat)
+            elif self.stall_start is not None:
+                duration = self.last_beat - self.stall_start
+                self.stall_log.info("Main loop resumed after %.1f s", duration)
+                log.warning("Watchdog: The main loop stalled for %.1f s", duration)
+                self.stall_start = None
+
+    def report(self, since_beat):
+        frame = sys._current_frames().get(self.main_thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame else 'Main thread not found\n'
+        screen = self.app.sm.current if self.app.sm else ''
+        self.stall_log.info("Main loop stalled for %.1f s on screen '%s':\n%s", since_beat, screen, stack)
+
+    def stop(self):
+        self.stopped.set()
+        self.beat_event.cancel()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy.clock import Clock
+from kivy.core.text import Label as CoreLabel
+from kivy.uix.label import Label
+
+from collections import OrderedDict, deque
+
+
+def freeze(value):
+    """Turns (nested) lists and dicts of label options into something hashable."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+class TextureCache:
+    """
+    Least recently used cache of rendered label textures, keyed by text and every option
+    influencing the rendering (font, size, text_size, alignment, ...). Labels using the
+    CachedTextMixin get their texture from here, so strings that come up again (e.g.
+    "True"/"False") are only rasterised once, and textures can be rendered ahead of time
+    with prewarm, while nothing else is going on.
+    """
+
+    def __init__(self, max_size=64):
+        """
+        :param max_size: Number of textures kept. Textures of long questions are big, so
+                         this should be kept low on devices with little GPU memory.
+        """
+        self.max_size = max_size
+        self.textures = OrderedDict()
+        self.pending = deque()
+        self.prewarm_event = None
+
+    def get_options(self, widget, text, overrides=None):
+        """
+        Returns the core label options of widget, with its text replaced by the given one
+        and the given options overridden.
+        """
+        options = {name: getattr(widget, name) for name in Label._font_properties}
+        options['text'] = text
+        if overrides:
+            options.update(overrides)
+        return options
+
+    def get_texture(self, widget, text, overrides=None):
+        """
+        Returns the texture of widget displaying text, rendering it if needed, and whether
+        the text had to be shortened to fit.
+        """
+        options = self.get_options(widget, text, overrides)
+        key = freeze(options)
+        rendered = self.textures.get(key)
+        if rendered is not None:
+            self.textures.move_to_end(key)
+            return rendered
+        # A dedicated core label is used, as core labels re-use their texture when re-rendered
+        core_label = CoreLabel(**options)
+        core_label.refresh()
+        rendered = (core_label.texture, core_label.is_shortened)
+        if core_label.texture is not None:
+            self.textures[key] = rendered
+            if len(self.textures) > self.max_size:
+                self.textures.popitem(last=False)
+        return rendered
+
+    def prewarm(self, widget, texts, **overrides):
+        """
+        Renders the textures of widget for the given texts ahead of time, one per frame,
+        so that assigning one of these texts later on does not need to render anything.
+        Options that will have changed by then, e.g. the text_size of a widget about to be
+        resized, can be given as keyword arguments.
+        """
+        self.pending.extend((widget, text, overrides) for text in texts if text)
+        if not self.prewarm_event and self.pending:
+            self.prewarm_event = Clock.schedule_interval(self.render_pending, 0)
+
+    def render_pending(self, dt=None):
+        if not self.pending:
+            self.prewarm_event = None
+            return False
+        widget, text, overrides = self.pending.popleft()
+        self.get_texture(widget, text, overrides)
+
+
+label_textures = TextureCache()
+
+
+class CachedTextMixin:
+    """Mixin for Label based widgets taking their texture from the shared TextureCache."""
+
+    def texture_update(self, *largs):
+        if self.markup or self.disabled or not self.text.strip():
+            # Markup labels also track refs and anchors, and disabled ones use other
+            # colours, let the Label take care of these rare cases.
+            return super().texture_update(*largs)
+        # The bookkeeping of Label.texture_update after rendering. Stripping is done by the
+        # core label, as strip is one of the options it is created with.
+        texture, is_shortened = label_textures.get_texture(self, self.text)
+        self.texture = texture
+        self.texture_size = list(texture.size) if texture else [0, 0]
+        self.is_shortened = is_shortened
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from kivy.clock import Clock
+
+from heapq import heappop, heappush
+from itertools import count
+
+
+class Timeline:
+    """
+    Runs the timed steps (cues) of a screen's choreography, e.g. fading in its widgets one
+    after the other, from a single per-frame Clock event which only runs while cues are
+    pending. Cancelling the timeline drops all of its pending cues at once, so screens
+    cancel theirs when they are left and nothing they have lined up outlives them.
+    """
+
+    def __init__(self):
+        self.cues = []
+        self.order = count()
+        self.event = None
+
+    def at(self, delay, callback, *args):
+        """
+        Calls callback(*args) delay seconds from now. Returns the cue, which can be passed
+        to cancel to drop it again.
+        """
+        cue = [Clock.get_time() + delay, next(self.order), callback, args]
+        heappush(self.cues, cue)
+        if self.event is None:
+            self.event = Clock.schedule_interval(self.tick, 0)
+        return cue
+
+    def stagger(self, delay, interval, callback, items):
+        """
+        Calls callback(item) for every item, the first one delay seconds from now and every
+        following one interval seconds later. Returns the delay after the last item, so
+        that further cues can be lined up behind them.
+        """
+        for item in items:
+            self.at(delay, callback, item)
+            delay += interval
+        return delay
+
+    def cancel(self, cue=None):
+        """Drops the given cue, or all pending cues of the timeline if no cue is given."""
+        if cue is not None:
+            cue[2] = None
+            return
+        del self.cues[:]
+        self.stop()
+
+    def stop(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+    def tick(self, dt=None):
+        now = Clock.get_time()
+        cues = self.cues
+        while cues and cues[0][0] <= now:
+            cue = heappop(cues)
+            callback = cue[2]
+            if callback is not None:
+                cue[2] = None
+                callback(*cue[3])
+        if not cues:
+            self.stop()
@@ -2,26 +2,98 @@
 # -*- coding: utf-8 -*-
 
 from kivy.network.urlrequest import UrlRequest
+from kivy.event import EventDispatcher
+from kivy.clock import Clock
 from html import unescape
+from collections import deque
+from functools import partial
+from threading import Thread
+
+from logs import get_logger, is_debug
+from question import QuestionSet
 
 import json
 
+log = get_logger('trivia')
+TRIVIA_DEBUG = is_debug(log)
+
+
+# Seconds to wait after a game has started before refilling the prefetch buffer.
+# This keeps the request away from the game's opening animations, and OpenTDB
+# only allows one request every 5 seconds per IP anyway.
+PREFETCH_DELAY = 6
+
+# Seconds after which a pending request is given up on and the question cache is used instead.
+FETCH_TIMEOUT = 8
+
+# Question fields which may contain HTML entities
+TEXT_FIELDS = ('question', 'correct_answer', 'category', 'author')
+TEXT_LIST_FIELDS = ('incorrect_answers',)
+
+# Question sets with more questions than this are decoded in a background thread
+THREADED_DECODE_MIN = 100
 
-class Trivia:
-    """Trivia class"""
 
-    def __init__(self, use_sample_data=False):
+class Trivia(EventDispatcher):
+    """
+    Trivia class
+
+    Dispatches on_game_ready once a new game can be played, on_fetch_failed(reason) if no
+    question set could be obtained and on_fetch_timeout if the request took too long.
+    """
+
+    __events__ = ('on_game_ready', 'on_fetch_failed', 'on_fetch_timeout')
+
+    def __init__(self, use_sample_data=False, prefetch_depth=1, cache=None, cache_first=False, answer_seed=None,
+                 **kwargs):
+        super().__init__(**kwargs)
         self.quiz_data = None
         self.req = None
+        self.timeout_event = None
         self.score = 0
         self.round = 0
         self.running = False
         self.use_sample_data = use_sample_data
 
+        # Seed for the answer orders, for reproducible games (None: random orders)
+        self.answer_seed = answer_seed
+
+        # Ready-to-play question sets, buffered per game settings (see get_key)
+        self.prefetch_depth = prefetch_depth
+        self.prefetched = {}
+        self.prefetch_reqs = {}
+        self.prefetch_event = None
+
+        # Optional QuestionCache recording every fetched question, used as offline fallback
+        # or, in cache first mode, as primary source of questions.
+        self.cache = cache
+        self.cache_first = cache_first
+
+    def on_game_ready(self):
+        pass
+
+    def on_fetch_failed(self, reason):
+        pass
+
+    def on_fetch_timeout(self):
+        pass
+
     def new_game(self, api_url, difficulty, category, amount, q_type, wait=False):
         self.score = 0
         self.round = 0
-        self.fetch_new(api_url, difficulty, category, amount, q_type, wait=wait)
+        self.running = False
+        self.cancel_fetch()
+        key = self.get_key(api_url, difficulty, category, amount, q_type)
+        buffered = self.prefetched.get(key)
+        if buffered:
+            # A question set for these settings is already waiting, no need to hit the network
+            self.start_game(buffered.popleft())
+            self.schedule_prefetch(key)
+        elif self.cache_first and self.start_from_cache(key, complete=True):
+            # Keep the cache fresh for the next games
+            self.schedule_prefetch(key)
+        else:
+            self.fetch_new(api_url, difficulty, category, amount, q_type, wait=wait)
 
     def get_current_round(self):
         return self.round + 1
@@ -36,7 +108,7 @@ class Trivia:
         if self.running:
             if result:
                 self.score += 1
-                print("CURRENT SCORE: {}".format(self.score))
+                log.debug("Trivia: Current score %s", self.score)
             self.round += 1
             if self.round >= len(self.quiz_data):
                 self.running = False
@@ -44,50 +116,223 @@ class Trivia:
     def check_game(self):
         return self.running
 
+    def start_game(self, quiz_data):
+        """Hands a decoded question set over to the game."""
+        self.quiz_data = quiz_data
+        self.running = True
+        self.dispatch('on_game_ready')
+
+    def start_from_cache(self, key, complete=False):
+        """
+        Starts a game with questions drawn from the question cache. If complete is set,
+        the game is only started if the cache holds the full amount of questions asked for.
+        Returns whether a game has been started.
+        """
+        if not self.cache:
+            return False
+        api_url, difficulty, category, q_type, amount = key
+        questions = self.cache.draw(api_url, difficulty, category, amount, q_type)
+        if not questions or (complete and len(questions) < amount):
+            return False
+        log.info("Trivia: Starting game with %s cached questions", len(questions))
+        self.start_game(QuestionSet(questions, self.answer_seed))
+        return True
+
+    def store_in_cache(self, key, questions):
+        """Hands questions over to the cache, which writes them to disk in the background."""
+        if self.cache and key and questions and not self.use_sample_data:
+            self.cache.store(key[0], key[2], questions)
+
+    @staticmethod
+    def get_key(api_url, difficulty, category, amount, q_type):
+        """Returns the key under which question sets for the given settings are buffered."""
+        return api_url, difficulty, category, q_type, amount
+
+    @staticmethod
+    def build_url(api_url, difficulty, category, amount, q_type):
+        base_url = api_url + '?'
+        if difficulty != '':
+            base_url += 'difficulty=' + str(difficulty) + '&'
+        if category != 0:
+            base_url += 'category=' + str(category) + '&'
+        if q_type != '':
+            base_url += 'type=' + str(q_type) + '&'
+        base_url += 'amount=' + str(amount)
+        return base_url
+
     def fetch_new(self, api_url, difficulty, category, amount, q_type, wait=False):
+        key = self.get_key(api_url, difficulty, category, amount, q_type)
         if self.use_sample_data:
-            import json
             with open('./resources/sample_quiz_data.json') as f:
                 data = json.load(f)
-            self.fetch_success(None, data)
+            self.fetch_success(None, data, key=key)
         else:
-            base_url = api_url + '?'
-            if difficulty is not '':
-                base_url += 'difficulty=' + str(difficulty) + '&'
-            if category is not 0:
-                base_url += 'category=' + str(category) + '&'
-            if q_type is not '':
-                base_url += 'type=' + str(q_type) + '&'
-            base_url += 'amount=' + str(amount)
-            self.req = UrlRequest(base_url, on_success=self.fetch_success, on_failure=self.fetch_fail, on_error=self.fetch_error)
+            base_url = self.build_url(api_url, difficulty, category, amount, q_type)
+            self.req = UrlRequest(base_url, on_success=partial(self.fetch_success, key=key),
+                                  on_failure=partial(self.fetch_fail, key=key),
+                                  on_error=partial(self.fetch_error, key=key),
+                                  timeout=FETCH_TIMEOUT)
+            self.timeout_event = Clock.schedule_once(partial(self.fetch_timeout, key), FETCH_TIMEOUT)
             if wait:
                 self.req.wait()
 
-    def fetch_success(self, request, result):
-        self.quiz_data = self.html_decode(result['results'])
-        self.running = True
-        try:
-            print(self.quiz_data)
-            print()
-        except:
-            # Probably a unicode error.
-            print("Could not print quiz data.")
+    def cancel_fetch(self):
+        """Abandons the pending request, if any. Its callbacks will be ignored."""
+        if self.timeout_event:
+            self.timeout_event.cancel()
+            self.timeout_event = None
+        if self.req:
+            self.req.cancel()
+            self.req = None
+
+    def is_stale(self, request):
+        """Whether a request callback belongs to a request that has been abandoned in the meantime."""
+        return request is not None and request is not self.req
+
+    def fetch_success(self, request, result, key=None):
+        if self.is_stale(request):
+            return
+        if self.timeout_event:
+            # The response is here, decoding it does not count towards the timeout
+            self.timeout_event.cancel()
+            self.timeout_event = None
+        if not result.get('results'):
+            # Not enough questions for these settings (OpenTDB response code 1) or rate limited
+            self.cancel_fetch()
+            self.fetch_failed(key, "No questions received (response code {})".format(result.get('response_code')))
+            return
+        self.decode(result['results'], partial(self.fetch_decoded, request, key),
+                    partial(self.fetch_decode_failed, request, key))
+
+    def fetch_decoded(self, request, key, questions):
+        if self.is_stale(request):
+            return
+        self.cancel_fetch()
+        if TRIVIA_DEBUG:
+            log.debug("Trivia: Received quiz data %s", questions)
+        self.start_game(questions)
+        if key is not None:
+            self.schedule_prefetch(key)
+        self.store_in_cache(key, questions)
 
-    def fetch_fail(self, request, result):
-        print("Failure fetching quiz data: {}".format(result))
+    def fetch_decode_failed(self, request, key, error):
+        if self.is_stale(request):
+            return
+        self.cancel_fetch()
+        self.fetch_failed(key, "Error decoding quiz data: {}".format(error))
 
-    def fetch_error(self, request, error):
-        print("Error fetching quiz data: {}".format(error))
+    def fetch_fail(self, request, result, key=None):
+        if self.is_stale(request):
+            return
+        self.cancel_fetch()
+        self.fetch_failed(key, "Failure fetching quiz data: {}".format(result))
 
-    def html_decode(self, quiz_obj):
+    def fetch_error(self, request, error, key=None):
+        if self.is_stale(request):
+            return
+        self.cancel_fetch()
+        self.fetch_failed(key, "Error fetching quiz data: {}".format(error))
+
+    def fetch_timeout(self, key, dt=None):
+        self.timeout_event = None
+        self.cancel_fetch()
+        log.warning("Trivia: Timeout fetching quiz data after %s seconds", FETCH_TIMEOUT)
+        if not self.start_from_cache(key):
+            self.dispatch('on_fetch_timeout')
+
+    def fetch_failed(self, key, reason):
+        """Falls back to cached questions, or signals the failure if there are none."""
+        log.warning("Trivia: %s", reason)
+        if key is None or not self.start_from_cache(key):
+            self.dispatch('on_fetch_failed', reason)
+
+    def schedule_prefetch(self, key):
         """
-        URL decodes or unencodes the quiz data recursively.
-        Credits to https://nvie.com/posts/modifying-deeply-nested-structures/
+        Schedules a refill of the prefetch buffer for the given settings, so that the
+        next game with the same settings ("Play again") can start without waiting for
+        the network. Only the most recent settings are kept warm.
         """
-        if isinstance(quiz_obj, dict):
-            return {k: self.html_decode(v) for k, v in quiz_obj.items()}
-        elif isinstance(quiz_obj, list):
-            return [self.html_decode(elem) for elem in quiz_obj]
-        else:
-            return unescape(quiz_obj)
+        if self.use_sample_data or self.prefetch_depth < 1:
+            return
+        if self.prefetch_event:
+            self.prefetch_event.cancel()
+        self.prefetch_event = Clock.schedule_once(partial(self.prefetch, key), PREFETCH_DELAY)
+
+    def prefetch(self, key, dt=None):
+        """Fetches one question set in the background unless the buffer is already full."""
+        self.prefetch_event = None
+        buffered = self.prefetched.setdefault(key, deque())
+        if len(buffered) >= self.prefetch_depth or key in self.prefetch_reqs:
+            return
+        api_url, difficulty, category, q_type, amount = key
+        self.prefetch_reqs[key] = UrlRequest(
+            self.build_url(api_url, difficulty, category, amount, q_type),
+            on_success=partial(self.prefetch_success, key),
+            on_failure=partial(self.prefetch_fail, key),
+            on_error=partial(self.prefetch_fail, key),
+            timeout=FETCH_TIMEOUT)
 
+    def prefetch_success(self, key, request, result):
+        self.prefetch_reqs.pop(key, None)
+        if not result.get('results'):
+            # Not enough questions for these settings, or rate limited (OpenTDB response codes)
+            log.info("Trivia: Prefetch for %s returned no questions (response code %s)", key, result.get('response_code'))
+            return
+        self.decode(result['results'], partial(self.prefetch_decoded, key), partial(self.prefetch_decode_failed, key))
+
+    def prefetch_decoded(self, key, questions):
+        buffered = self.prefetched.setdefault(key, deque())
+        buffered.append(questions)
+        if len(buffered) < self.prefetch_depth:
+            self.schedule_prefetch(key)
+        self.store_in_cache(key, questions)
+
+    def prefetch_decode_failed(self, key, error):
+        log.info("Trivia: Error decoding prefetched quiz data for %s: %s", key, error)
+
+    def prefetch_fail(self, key, request, result):
+        self.prefetch_reqs.pop(key, None)
+        log.info("Trivia: Failure prefetching quiz data for %s: %s", key, result)
+
+    def decode(self, questions, callback, errback):
+        """
+        Decodes the questions of a response into a QuestionSet and passes it to callback on
+        the main thread, or the exception to errback if the response is malformed. Large
+        question sets are decoded in a background thread to keep the UI responsive.
+        """
+        if len(questions) < THREADED_DECODE_MIN:
+            try:
+                decoded = QuestionSet.from_dicts(self.html_decode(questions), self.answer_seed)
+            except Exception as exc:
+                errback(exc)
+                return
+            callback(decoded)
+            return
+
+        def decode_in_thread():
+            try:
+                decoded = QuestionSet.from_dicts(self.html_decode(questions), self.answer_seed)
+            except Exception as exc:
+                # exc is unbound when the except clause ends, hand it over as default
+                Clock.schedule_once(lambda dt, exc=exc: errback(exc))
+                return
+            Clock.schedule_once(lambda dt: callback(decoded))
+
+        Thread(target=decode_in_thread, daemon=True).start()
+
+    def html_decode(self, questions):
+        """
+        Unescapes the HTML entities in the text fields of the questions, in place.
+        Other fields are left alone, and so are strings without any entity.
+        """
+        for question in questions:
+            for field in TEXT_FIELDS:
+                value = question.get(field)
+                if isinstance(value, str) and '&' in value:
+                    question[field] = unescape(value)
+            for field in TEXT_LIST_FIELDS:
+                values = question.get(field)
+                if values:
+                    question[field] = [unescape(value) if isinstance(value, str) and '&' in value else value
+                                       for value in values]
+        return questions